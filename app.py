@@ -1,21 +1,26 @@
 # app.py — ⚡원샷원킬 배너 생성기 (설정은 본문, 피드백은 별도 페이지)
 
-import io, zipfile, math, datetime
+import io, time, zipfile, tempfile, math, datetime
 from pathlib import Path
-from PIL import Image, ImageOps
+from PIL import Image, ImageDraw
 import streamlit as st
+from resizer import (VALID_EXTS, OUTPUT_FORMATS, PRESETS, SCALE_OPTIONS, sanitize_label, parse_custom_sizes, parse_bytes,
+                     format_bytes, BUDGET_FORMATS, JPEG_SUBSAMPLING,
+                     scaled_size, output_name, open_source, make_proxy, resize_fit, pad_fill, ensure_rgb, crop_focus,
+                     write_zip_batch, zip_compression, source_hash, render_key, RenderCache, FocalStore, EFFORT_RANGES,
+                     header_cost, AdmissionGate, open_image, pixel_limit, STREAM_MAX_MP)
 
 APP_TITLE = " ⚡원샷원킬 배너 생성기"
-VALID_EXTS = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tiff"}
-PRESETS = [
-    ("Landing Page_Thumbnail", (600, 350)),
-    ("Landing Page_banner", (1920, 440)),
-    ("Speaker", (250, 250)),
-    ("List Thumbnail", (720, 420)),
-    ("Carousel Banner", (1200, 370)),
-    ("Email Header", (600, 280)),
-]
-SCALE_OPTIONS = [0.5, 1.0, 1.5, 2.0, 2.5, 3.0]
+ZIP_SPOOL_MAX = 64*1024*1024  # ZIP 아카이브가 이 크기를 넘으면 메모리 대신 임시 파일로
+PROXY_MAX_SIDE = 1024   # 미리보기용 축소 소스의 긴 변(px)
+PREVIEW_QUALITY = 80    # 원본 미리보기 JPEG 품질 (브라우저로 보내는 용량)
+PREVIEW_WIDTH = 220     # 사이즈별 미리보기 한 칸의 최대 너비(px)
+RENDER_CACHE_MAX = 256*1024*1024  # 렌더 캐시 총 용량 (세션 공통)
+PNG_LEVEL_LABELS = {"빠름 (압축 레벨 1)": "fast", "균형 (레벨 6)": "balanced", "최대 (레벨 9 + optimize, 느림)": "max"}
+CROP_LABELS = {"중앙": "center", "스마트 (관심 영역 자동 탐지)": "smart"}
+FIT_LABELS = {"채우기 (Fill — 넘치는 부분 크롭)": "cover", "맞추기 (Contain — 전체 표시 + 여백)": "contain"}
+# ZIP 압축 옵션 → deflate 레벨 (None: 포맷별 자동 — JPG/PNG는 무압축, 0: 무압축)
+ZIP_LEVELS = {"자동 (JPG/PNG 무압축)": None, "무압축": 0, "Deflate 1 (빠름)": 1, "Deflate 6": 6, "Deflate 9 (최대)": 9}
 
 # ✅ 가장 먼저 호출해야 합니다!
 st.set_page_config(page_title="원샷원킬 배너 생성기", page_icon="⭐", layout="centered")
@@ -59,26 +64,71 @@ with st.sidebar:
 
 
 # ---- helpers ----
-def sanitize_label(s: str) -> str:
-    bad='\\/:*?"<>|'
-    out=s.strip().replace(" ","_")
-    for ch in bad: out=out.replace(ch,"")
-    return out
-
-def resize_cover(im: Image.Image, w: int, h: int) -> Image.Image:
-    im = ImageOps.exif_transpose(im)
-    sw, sh = im.size
-    scale = max(w/sw, h/sh)
-    nw, nh = max(1,int(sw*scale)), max(1,int(sh*scale))
-    im2 = im.resize((nw,nh), Image.LANCZOS)
-    x=(nw-w)//2; y=(nh-h)//2
-    return im2.crop((x,y,x+w,y+h))
-
-def ensure_rgb(img: Image.Image, bg=(255,255,255)) -> Image.Image:
-    if img.mode in ("RGBA","LA") or (img.mode=="P" and "transparency" in img.info):
-        from PIL import Image as PILImage
-        base=PILImage.new("RGB",img.size,bg); base.paste(img, mask=img.split()[-1]); return base
-    return img.convert("RGB") if img.mode!="RGB" else img
+@st.cache_resource
+def render_cache() -> RenderCache:
+    # 프로세스 전체에서 공유 — rerun·다른 세션에서도 같은 소스/사이즈/포맷은 재사용
+    return RenderCache(RENDER_CACHE_MAX)
+
+@st.cache_resource
+def export_gate() -> AdmissionGate:
+    # 프로세스 전체에서 하나 — 여러 세션의 내보내기가 동시 실행 수·예상 메모리 한도 안에서 차례로 실행
+    return AdmissionGate()
+
+@st.cache_resource
+def focal_store() -> FocalStore:
+    # 사용자가 지정한 초점 — 콘텐츠 해시 기준으로 저장되어 같은 이미지를 다시 올려도 유지 (CLI와 파일 공유)
+    return FocalStore()
+
+def upload_hash(uploaded) -> str:
+    # 업로드 파일당 한 번만 해시 (rerun마다 수십 MB를 다시 읽지 않도록)
+    hashes = st.session_state.setdefault("upload_hashes", {})
+    if uploaded.file_id not in hashes:
+        hashes[uploaded.file_id] = source_hash(uploaded.getbuffer())
+    return hashes[uploaded.file_id]
+
+def upload_header(uploaded):
+    # 헤더만 읽어 연 이미지 (픽셀은 디코드하지 않음)
+    uploaded.seek(0)
+    return open_image(uploaded)
+
+def upload_loader(uploaded):
+    # write_zip_batch용 load_source — 캐시에 없는 사이즈들(need) 기준으로 디코드 (대형 소스는 스트립 처리)
+    def load_source(need):
+        uploaded.seek(0)
+        return open_source(open_image(uploaded), need)
+    return load_source
+
+@st.cache_resource(max_entries=8, show_spinner="미리보기 준비 중… (다른 작업이 많으면 차례를 기다립니다)")
+def source_proxy(key: str, _uploaded) -> Image.Image:
+    # 콘텐츠 해시 기준으로 캐시되는 저해상도 소스 — 미리보기는 모두 여기서 렌더
+    # JPEG 외에는 원본 전체를 디코드하므로 내보내기와 같은 허용 제어(export_gate)를 거침 (캐시된 뒤에는 호출되지 않음)
+    im = upload_header(_uploaded)
+    with export_gate().admit(header_cost(im, [(PROXY_MAX_SIDE, PROXY_MAX_SIDE)])):
+        return make_proxy(im, PROXY_MAX_SIDE)
+
+@st.cache_data(max_entries=16)
+def preview_jpeg(key: str, _uploaded) -> bytes:
+    # 원본 미리보기는 프록시를 JPEG로 다시 인코딩한 수백 KB만 전송 (전체 해상도 업로드를 보내지 않음)
+    bio = io.BytesIO()
+    ensure_rgb(source_proxy(key, _uploaded)).save(bio, format="JPEG", quality=PREVIEW_QUALITY)
+    return bio.getvalue()
+
+def preview_grid(proxy: Image.Image, targets, focus=None, fit: str = "cover", fill=(255,255,255), cols: int = 3):
+    # 선택된 사이즈별 크롭/여백 결과를 프록시에서 바로 렌더 (rerun마다 수 ms)
+    columns = st.columns(cols)
+    for i,(label,tw,th,_) in enumerate(targets):
+        pw = min(PREVIEW_WIDTH, tw); ph = max(1, round(th*pw/tw))
+        with columns[i % cols]:
+            st.image(resize_fit(proxy, pw, ph, focus=focus, fit=fit, fill=fill), caption=f"{label} — {tw}x{th}")
+
+def focus_overlay(proxy: Image.Image, focus) -> Image.Image:
+    # 프록시 위에 초점 위치를 십자선으로 표시
+    img = ensure_rgb(proxy).copy(); d = ImageDraw.Draw(img)
+    x, y = focus[0]*img.width, focus[1]*img.height; r = max(6, min(img.size)//40); lw = max(2, r//4)
+    d.line((x, 0, x, img.height), fill=(255,64,64), width=max(1, lw//2))
+    d.line((0, y, img.width, y), fill=(255,64,64), width=max(1, lw//2))
+    d.ellipse((x-r, y-r, x+r, y+r), outline=(255,255,255), width=lw)
+    return img
 
 # ---- quick-links / footer (본문 하단) ----
 st.markdown("""
@@ -104,73 +154,176 @@ st.caption("이미지 하나로 마이다스 이벤트에 필요한 사이즈를
 st.header("설정")
 colA, colC, colB = st.columns(3)
 with colA:
-    fmt = st.selectbox("출력 포맷", ["jpg","jpeg","png"], index=0)
+    fmt = st.selectbox("출력 포맷", OUTPUT_FORMATS, index=0)
 with colB:
-    jpg_qual = st.slider("JPEG 품질", min_value=60, max_value=100, value=88)
+    quality = st.slider("품질 (JPG/WebP/AVIF)", min_value=40, max_value=100, value=88, disabled=fmt == "png")
 with colC:
     scale = st.selectbox("출력 배율", SCALE_OPTIONS, index=SCALE_OPTIONS.index(2.0))
+with st.expander("고급 설정"):
+    zip_level = ZIP_LEVELS[st.selectbox("ZIP 압축", list(ZIP_LEVELS), index=0)]
+    opts = {}
+    if fmt in EFFORT_RANGES:
+        lo, hi, default = EFFORT_RANGES[fmt]
+        opts["effort"] = st.slider(f"{fmt.upper()} 인코딩 노력 (클수록 느리지만 파일이 작음)", lo, hi, default)
+    if fmt in ("jpg","jpeg"):
+        # 프로그레시브: 큰 배너가 저해상도부터 먼저 보임 / 4:4:4: 색 경계(텍스트·로고)가 선명하지만 용량 증가
+        c1, c2 = st.columns(2)
+        if c1.checkbox("프로그레시브 JPEG", value=False): opts["progressive"] = True
+        sub = c2.selectbox("크로마 서브샘플링", ["기본 (4:2:0)"] + JPEG_SUBSAMPLING, index=0)
+        if sub in JPEG_SUBSAMPLING: opts["subsampling"] = sub
+    if fmt == "png":
+        # max는 zlib 전략을 여러 번 시도해 3x 배너에서 수 초 — 파일별 결과에서 인코딩 시간 확인
+        c1, c2 = st.columns(2)
+        level = PNG_LEVEL_LABELS[c1.selectbox("PNG 압축", list(PNG_LEVEL_LABELS), index=1)]
+        if level != "balanced": opts["png"] = level
+        if c2.checkbox("팔레트(256색)로 줄이기 — 로고·평면 그래픽용", value=False): opts["quantize"] = 256
+    if st.checkbox("원본 메타데이터(EXIF/ICC) 유지", value=False): opts["metadata"] = "keep"
+    fit = FIT_LABELS[st.selectbox("맞춤 방식", list(FIT_LABELS), index=0)]
+    pad = "#ffffff"
+    if fit == "contain":
+        # 여백: 단색(투명 PNG도 이 색 위에 합성) 또는 원본을 흐리게 깐 배경
+        if st.radio("여백 채우기", ["단색", "블러 배경"], horizontal=True) == "블러 배경": pad = "blur"
+        else: pad = st.color_picker("여백 색", "#ffffff")
+    crop = CROP_LABELS[st.selectbox("크롭 방식", list(CROP_LABELS), index=0, disabled=fit == "contain")]
 
 st.markdown("---")
 
-uploaded = st.file_uploader("이미지 업로드 (PNG/JPG 등, 1개)", type=[e.strip(".") for e in VALID_EXTS], accept_multiple_files=False)
-if uploaded:
+batch = st.checkbox("배치 모드 — 여러 이미지를 같은 사이즈로 한 번에 추출", value=False)
+files = st.file_uploader("이미지 업로드 (PNG/JPG 등, 여러 개)" if batch else "이미지 업로드 (PNG/JPG 등, 1개)",
+                         type=[e.strip(".") for e in VALID_EXTS], accept_multiple_files=batch)
+uploads = (files or []) if batch else ([files] if files else [])
+if uploads:
     from PIL import Image
-    file_ext = Path(uploaded.name).suffix.lower()
-    if file_ext not in VALID_EXTS:
+    if any(Path(u.name).suffix.lower() not in VALID_EXTS for u in uploads):
         st.error("지원하지 않는 이미지 형식입니다."); st.stop()
+    # 픽셀 수 한도 — 디코드 전에 헤더 크기로 거름 (무압축 TIFF/BMP는 RESIZER_MAX_MP, 그 외는 Pillow 한도)
+    # Pillow의 디코드 폭탄 오류도 같은 안내로
+    for u in uploads:
+        try:
+            im = upload_header(u); limit = pixel_limit(im); too_big = im.width*im.height > limit
+        except Image.DecompressionBombError:
+            limit, too_big = Image.MAX_IMAGE_PIXELS, True
+        if too_big:
+            st.error(f"{u.name}: 이미지가 너무 큽니다 (최대 {limit/1e6:.0f}MP — 무압축 TIFF/BMP는 "
+                     f"{STREAM_MAX_MP:.0f}MP까지)."); st.stop()
 
-    img = Image.open(uploaded)
-    w, h = img.size
-    st.image(img, caption=f"원본 미리보기 — {w}x{h}px", use_column_width=True)
-
-    base_title = st.text_input("이미지 타이틀(파일명 베이스)", value=Path(uploaded.name).stem)
+    uploaded = uploads[0]
+    store = focal_store()
+    w, h = upload_header(uploaded).size
+    st.image(preview_jpeg(upload_hash(uploaded), uploaded), caption=f"원본 미리보기 — {w}x{h}px", use_column_width=True)
+    if batch:
+        st.caption(f"총 {len(uploads)}개 이미지 — 미리보기는 첫 번째 이미지 기준입니다.")
+        base_title = st.text_input("ZIP 파일명", value="batch")
+    else:
+        base_title = st.text_input("이미지 타이틀(파일명 베이스)", value=Path(uploaded.name).stem)
 
     st.subheader("사이즈 선택")
     select_all = st.checkbox("전체 선택", value=True)
     chosen=[]
     for i,(name,(pw,ph)) in enumerate(PRESETS):
         checked = st.checkbox(f"{name} — {pw}x{ph}", value=True if select_all else False, key=f"preset_{i}")
-        if checked: chosen.append((name,pw,ph))
+        if checked: chosen.append((name,pw,ph,None))
+    if chosen and fmt in BUDGET_FORMATS:
+        with st.expander("프리셋별 용량 상한 (선택) — 넘지 않도록 품질을 자동으로 낮춤"):
+            for j,(name,pw,ph,_) in enumerate(chosen):
+                text = st.text_input(f"{name} — {pw}x{ph}", key=f"budget_{name}", placeholder="예: 150KB")
+                try: chosen[j] = (name,pw,ph,parse_bytes(text))
+                except ValueError: st.warning(f"용량 상한을 읽을 수 없습니다: `{text}`")
 
-    st.markdown("**커스텀 사이즈 (선택)** — 한 줄에 하나씩 `라벨, WxH` 형식 (예: `SNS, 1080x1080`)")
+    st.markdown("**커스텀 사이즈 (선택)** — 한 줄에 하나씩 `라벨, WxH` 형식 (예: `SNS, 1080x1080`), "
+                "세 번째 값으로 용량 상한 지정 가능 (예: `Email, 600x200, 100KB`)")
     custom_text = st.text_area("예시", "Banner 2, 1200x630\nSquare, 1080x1080", height=120)
-    custom=[]
-    if custom_text.strip():
-        for line in custom_text.splitlines():
-            line=line.strip()
-            if not line: continue
-            try:
-                left,right=line.split(",",1)
-                label=left.strip()
-                sw,sh = right.lower().replace("×","x").replace(" ","").split("x",1)
-                custom.append((label,int(sw),int(sh)))
-            except Exception:
-                st.warning(f"무시된 입력: `{line}`")
+    custom, ignored = parse_custom_sizes(custom_text)
+    for line in ignored:
+        st.warning(f"무시된 입력: `{line}`")
     targets = chosen+custom
+    if fmt not in BUDGET_FORMATS and any(t[3] for t in targets):
+        st.caption("PNG는 무손실이라 용량 상한을 적용하지 않습니다.")
+
+    if targets:
+        st.subheader("미리보기")
+        h = upload_hash(uploaded)
+        proxy = source_proxy(h, uploaded)
+        saved_focus = store.get(h)
+        if fit == "cover":
+            with st.expander("초점 직접 지정", expanded=saved_focus is not None):
+                manual = st.checkbox("이 이미지의 초점을 직접 지정 (모든 사이즈에 적용 · 같은 이미지를 다시 올려도 유지)",
+                                     value=saved_focus is not None, key=f"manual_{h}")
+                if manual:
+                    fx0, fy0 = saved_focus or crop_focus(proxy, crop)
+                    c1, c2 = st.columns(2)
+                    fx = c1.slider("가로 위치 (%)", 0, 100, round(fx0*100), key=f"fx_{h}")/100
+                    fy = c2.slider("세로 위치 (%)", 0, 100, round(fy0*100), key=f"fy_{h}")/100
+                    if (fx, fy) != saved_focus: store.set(h, (fx, fy))
+                    st.image(focus_overlay(proxy, (fx, fy)), width=PREVIEW_WIDTH*2)
+                elif saved_focus is not None:
+                    store.delete(h)
+        # 단일 모드에서는 미리보기와 같은 초점으로 내보냄 (배치는 소스마다 저장된 초점 또는 crop 방식)
+        focus = None if fit == "contain" else store.get(h) or crop_focus(proxy, crop)
+        preview_grid(proxy, targets, focus, fit, pad_fill(proxy, pad) if fit == "contain" else None)
 
     run = st.button("Run", type="primary")
     if run:
         if not targets:
             st.error("내보낼 사이즈를 하나 이상 선택/입력하세요."); st.stop()
 
-        zip_buf = io.BytesIO(); saved=[]
-        with zipfile.ZipFile(zip_buf, "w", compression=zipfile.ZIP_DEFLATED) as zf:
-            for label,tw,th in targets:
-                stw = max(1, int(round(tw*float(scale))))
-                sth = max(1, int(round(th*float(scale))))
-                out = resize_cover(img, stw, sth)
-                label_safe = sanitize_label(label)
-                out_name = f"{sanitize_label(base_title)}_{label_safe}_{stw}x{sth}.{fmt}"
-                bio = io.BytesIO()
-                if fmt in ("jpg","jpeg"):
-                    ensure_rgb(out).save(bio, format="JPEG", quality=int(jpg_qual), optimize=True)
-                else:
-                    out.save(bio, format="PNG", optimize=True)
-                bio.seek(0); zf.writestr(out_name, bio.read()); saved.append(out_name)
-
-        zip_buf.seek(0)
-        st.success(f"이미지 추출 완료 ✅  (총 {len(saved)}개)")
-        st.download_button("ZIP 다운로드", data=zip_buf.getvalue(),
+        sizes = [scaled_size(tw, th, scale) for _,tw,th,_ in targets]
+        budgets = [t[3] for t in targets]
+        jobs=[]; folders=set()
+        for u in uploads:
+            # 배치 모드: 소스별 폴더(파일명 stem)로 묶고, 파일명 베이스도 각 소스의 stem
+            title = Path(u.name).stem if batch else base_title
+            folder = sanitize_label(title)
+            while batch and folder in folders: folder += "_"
+            folders.add(folder)
+            names = [f"{folder+'/' if batch else ''}{output_name(title, label, stw, sth, fmt)}"
+                     for (label,_,_,_),(stw,sth) in zip(targets, sizes)]
+            manual = store.get(upload_hash(u))  # 사용자가 지정한 초점이 있으면 crop 방식보다 우선
+            keys = [render_key(upload_hash(u), stw, sth, fmt, quality, scale, crop=crop, focus=manual,
+                               fit=fit, pad=pad, opts=opts, max_bytes=b)
+                    for (stw,sth),b in zip(sizes, budgets)]
+            jobs.append((names, upload_loader(u), keys, manual if batch else focus))
+        saved = [n for job in jobs for n in job[0]]
+
+        # 캐시에 없는 사이즈만 디코드·렌더하므로 그 기준으로 예상 메모리를 계산 — 동시에 디코드되는 소스는 최대 2개(prefetch)
+        cache = render_cache()
+        costs = [header_cost(upload_header(u), [sz for sz,k in zip(sizes, keys) if cache.get(k) is None])
+                 for u,(_,_,keys,_) in zip(uploads, jobs)]
+        waiting = st.empty()
+        def show_queue(pos):
+            running, _ = export_gate().status()
+            waiting.info(f"⏳ 다른 내보내기 작업이 끝나기를 기다리는 중 — 대기 순번 {pos} (실행 중 {running}개)")
+        with export_gate().admit(sum(sorted(costs)[-2:]), show_queue):
+            waiting.empty()
+            t0 = time.perf_counter()
+            zip_buf = tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_MAX)
+            compression, compresslevel = zip_compression(fmt, zip_level)
+            report = []  # 항목별 (이름, 품질, 바이트) — jobs·targets 순서
+            with zipfile.ZipFile(zip_buf, "w", compression=compression, compresslevel=compresslevel) as zf:
+                # 대형 소스는 스트립 처리·프로세스 풀(공유 메모리), 그 외는 스레드 풀 — 항목은 소스·targets 순서대로
+                rendered = write_zip_batch(zf, jobs, sizes, fmt, quality, cache, crop=crop, fit=fit, pad=pad,
+                                           opts=opts, budgets=budgets, report=report)
+        elapsed = max(time.perf_counter()-t0, 1e-6)
+
+        zip_buf.seek(0)  # download_button은 bytes만 받으므로 완성된 아카이브를 한 번만 읽어 넘김
+        st.success(f"이미지 추출 완료 ✅  (총 {len(saved)}개, 새로 렌더 {rendered}개 · 캐시 재사용 {len(saved)-rendered}개)")
+        if batch:
+            mp = sum(math.prod(upload_header(u).size) for u in uploads)/1e6  # 헤더 기준 원본 픽셀
+            st.caption(f"처리량: {len(uploads)/elapsed:.2f} images/s · {mp/elapsed:.1f} MP/s (소요 {elapsed:.1f}s)")
+        budgeted = fmt in BUDGET_FORMATS and any(budgets)
+        with st.expander("파일별 결과 (크기·인코딩 시간)", expanded=budgeted):
+            # 인코딩 시간은 이번에 새로 렌더한 파일만 (용량 상한 탐색의 반복 인코딩 포함)
+            rows = []
+            for i,(name,q,n,ms) in enumerate(report):
+                row = {"파일": name, "크기": format_bytes(n), "인코딩": "캐시" if ms is None else f"{ms:.0f} ms"}
+                if fmt != "png": row["품질"] = q
+                if budgeted:
+                    b = budgets[i % len(budgets)]
+                    row["상한"] = format_bytes(b) if b else "—"
+                    row["결과"] = "" if not b else "✅" if n <= b else "⚠️ 최저 품질로도 초과"
+                rows.append(row)
+            st.dataframe(rows, hide_index=True, use_container_width=True)
+        st.download_button("ZIP 다운로드", data=zip_buf.read(),
                            file_name=f"{sanitize_label(base_title)}_resized.zip", mime="application/zip")
 else:
     st.info("이미지를 업로드하면 옵션이 표시됩니다.")
@@ -0,0 +1,260 @@
+# bench.py — 파이프라인 성능 측정 스크립트 (Streamlit 불필요)
+#   python bench.py zip            # ZIP 압축 정책별 소요 시간/크기
+#   python bench.py smart          # 스마트 크롭 초점 정확도/소요 시간
+#   python bench.py formats        # 포맷/노력별 프리셋당 용량·인코딩 시간
+#   python bench.py jpeg           # 프로그레시브/서브샘플링별 인코딩·디코딩 시간과 용량
+#   python bench.py cover          # 크롭 후 리샘플(box=) vs 전체 리샘플 후 크롭 — 시간과 픽셀 차이
+#   python bench.py pad            # contain 블러 여백: 저해상도 1회 vs 타깃마다 전체 해상도 블러
+#   python bench.py tiled          # 대형 무압축 TIFF: 전체 디코드 vs 스트립 처리 — 시간과 최대 메모리(RSS)
+#   python bench.py alpha          # 투명 PNG → JPEG: 타깃마다 알파 합성 vs 소스에서 한 번 합성 — 시간과 픽셀 차이
+
+import argparse, io, math, os, random, tempfile, time, zipfile
+from PIL import Image, ImageDraw, ImageFilter
+import resizer
+from resizer import PRESETS
+
+
+def sample_image(w=4000, h=3000, seed=1) -> Image.Image:
+    # 사진과 비슷한 통계를 갖는 합성 이미지 (그라디언트 + 도형 + 노이즈)
+    base = Image.merge("RGB", [Image.linear_gradient("L").resize((w,h)),
+                               Image.linear_gradient("L").rotate(90).resize((w,h)),
+                               Image.new("L", (w,h), 96)])
+    d = ImageDraw.Draw(base)
+    for i in range(12):
+        x, y = (seed*7919 + i*1543) % w, (seed*104729 + i*2711) % h
+        r = min(w,h)//(6+i)
+        d.ellipse((x-r, y-r, x+r, y+r), fill=((i*53)%256, (i*97)%256, (i*31)%256))
+    base = base.filter(ImageFilter.GaussianBlur(3))
+    noise = Image.effect_noise((w,h), 24).convert("RGB")
+    return Image.blend(base, noise, 0.15)
+
+def timed(fn, repeat=3):
+    best = None
+    for _ in range(repeat):
+        t = time.perf_counter(); r = fn(); dt = time.perf_counter()-t
+        best = dt if best is None or dt < best else best
+    return best, r
+
+def preset_sizes(scale: float):
+    return [resizer.scaled_size(w, h, scale) for _,(w,h) in PRESETS]
+
+def bench_zip(args):
+    src = resizer.prepare_source(sample_image())
+    sizes = preset_sizes(args.scale)
+    print(f"ZIP 압축 정책 — 프리셋 {len(sizes)}종, 배율 {args.scale}")
+    print(f"{'format':<6} {'policy':<12} {'ms':>8} {'bytes':>12}")
+    for fmt in ("jpg", "png"):
+        outs = [out[0] for out in resizer.render_all(src, sizes, fmt, 88)]
+        for label, level in (("auto", None), ("deflate-1", 1), ("deflate-6", 6), ("deflate-9", 9)):
+            compression, compresslevel = resizer.zip_compression(fmt, level)
+            def run():
+                buf = io.BytesIO()
+                with zipfile.ZipFile(buf, "w", compression=compression, compresslevel=compresslevel) as zf:
+                    for i,data in enumerate(outs):
+                        with zf.open(f"{i}.{fmt}", "w") as fp: fp.write(data)
+                return buf.tell()
+            dt, size = timed(run)
+            print(f"{fmt:<6} {label:<12} {dt*1000:>8.1f} {size:>12,}")
+
+def subject_image(w, h, rng):
+    # 부드러운 배경 위 임의 위치에 텍스처가 있는 피사체(원) — (이미지, 피사체 bbox)
+    bg = Image.merge("RGB", [Image.linear_gradient("L").resize((w,h)).point(lambda v: 60+v//3)]*3)
+    r = rng.randint(min(w,h)//10, min(w,h)//5)
+    cx, cy = rng.randint(r, w-r), rng.randint(r, h-r)
+    mask = Image.new("L", (w,h)); ImageDraw.Draw(mask).ellipse((cx-r, cy-r, cx+r, cy+r), fill=255)
+    texture = Image.effect_noise((w,h), 64).convert("RGB")
+    bg.paste(texture, mask=mask)
+    return bg, (cx-r, cy-r, cx+r, cy+r)
+
+def kept_fraction(size, w, h, focus, box):
+    # cover 크롭 창(소스 좌표)에 피사체 bbox가 남는 비율
+    nw, nh = resizer.cover_size(size, w, h); s = nw/size[0]
+    fx, fy = focus
+    x = min(max(math.floor(fx*nw - w/2), 0), nw-w)/s; y = min(max(math.floor(fy*nh - h/2), 0), nh-h)/s
+    ix = max(0, min(box[2], x+w/s) - max(box[0], x)); iy = max(0, min(box[3], y+h/s) - max(box[1], y))
+    return ix*iy / ((box[2]-box[0])*(box[3]-box[1]))
+
+def bench_smart(args):
+    rng = random.Random(args.seed)
+    wide = [(w,h) for name,(w,h) in PRESETS if w/h >= 2.5] + [(1080, 1920)]
+    rows = {"center": [], "smart": []}; ms = []; err = []
+    for i in range(args.images):
+        sw, sh = rng.choice([(4000,3000), (3000,3000), (3000,4000), (6000,2000)])
+        im, box = subject_image(sw, sh, rng)
+        t = time.perf_counter(); focus = resizer.crop_focus(im, "smart"); ms.append((time.perf_counter()-t)*1000)
+        cx, cy = (box[0]+box[2])/2/sw, (box[1]+box[3])/2/sh
+        err.append(math.hypot(focus[0]-cx, focus[1]-cy))
+        for w,h in wide:
+            rows["center"].append(kept_fraction((sw,sh), w, h, (0.5,0.5), box))
+            rows["smart"].append(kept_fraction((sw,sh), w, h, focus, box))
+    print(f"스마트 크롭 — 합성 이미지 {args.images}장, 와이드/세로 타깃 {wide}")
+    print(f"초점 오차(정규화 거리) 평균 {sum(err)/len(err):.3f} · 최대 {max(err):.3f}")
+    print(f"초점 계산 {sum(ms)/len(ms):.1f} ms/이미지 (최대 {max(ms):.1f} ms)")
+    for mode, vals in rows.items():
+        full = sum(v >= 0.99 for v in vals)/len(vals)
+        print(f"{mode:<7} 피사체 보존율 평균 {sum(vals)/len(vals):.1%} · 완전 보존 {full:.1%}")
+
+def bench_formats(args):
+    src = resizer.prepare_source(sample_image())
+    configs = [("jpg", {})] + [("png", {"png": level}) for level in resizer.PNG_LEVELS] + [("png", {"quantize": 256})]
+    for fmt in ("webp", "avif"):
+        if fmt not in resizer.OUTPUT_FORMATS: continue
+        lo, hi, default = resizer.EFFORT_RANGES[fmt]
+        configs += [(fmt, {"effort": e}) for e in sorted({lo, default, hi})]
+    print(f"포맷별 용량/인코딩 시간 — 품질 {args.quality}, 배율 {args.scale}"
+          + ("" if "avif" in resizer.OUTPUT_FORMATS else " (AVIF 미지원 Pillow — 생략)"))
+    print(f"{'preset':<22} {'size':>10} {'format':<18} {'ms':>8} {'bytes':>10}")
+    for name,(tw,th) in PRESETS:
+        w, h = resizer.scaled_size(tw, th, args.scale)
+        out = resizer.resize_cover(src, w, h)
+        for fmt, opts in configs:
+            dt, data = timed(lambda: resizer.encode_image(out, fmt, args.quality, opts=opts))
+            label = fmt + "".join(f" {v}" if k == "png" else f" {k}={v}" for k,v in opts.items())
+            print(f"{name:<22} {f'{w}x{h}':>10} {label:<18} {dt*1000:>8.1f} {len(data):>10,}")
+
+def bench_jpeg(args):
+    src = resizer.prepare_source(sample_image(6000, 4000))
+    tw, th = dict(PRESETS)[args.preset]
+    print(f"JPEG 옵션 — {args.preset}, 품질 {args.quality}")
+    print(f"{'size':>10} {'mode':<12} {'sub':<6} {'enc ms':>8} {'dec ms':>8} {'bytes':>10}")
+    for scale in (1.0, 3.0):
+        w, h = resizer.scaled_size(tw, th, scale)
+        out = resizer.resize_cover(src, w, h)
+        for progressive in (False, True):
+            for sub in resizer.JPEG_SUBSAMPLING:
+                opts = {"progressive": progressive, "subsampling": sub}
+                enc, data = timed(lambda: resizer.encode_image(out, "jpg", args.quality, opts=opts))
+                dec, _ = timed(lambda: Image.open(io.BytesIO(data)).load())
+                mode = "progressive" if progressive else "baseline"
+                print(f"{f'{w}x{h}':>10} {mode:<12} {sub:<6} {enc*1000:>8.1f} {dec*1000:>8.1f} {len(data):>10,}")
+
+def bench_cover(args):
+    import numpy as np
+    src = resizer.prepare_source(sample_image(args.side, args.side))
+    def full_then_crop(w, h):
+        # 이전 방식: 소스 전체를 (nw, nh)로 리샘플한 뒤 w×h만 잘라냄
+        nw, nh = resizer.cover_size(src.size, w, h)
+        box = resizer.cover_box((nw, nh), nw, nh, w, h)
+        return resizer._resize(src, nw, nh).crop(tuple(map(round, box)))
+    # 회귀 확인: 흔한 소스 크기 × 프리셋·배율·미리보기 크기 격자에서 크롭 창이 소스 안에 있고 출력이 정확히 w×h인지
+    targets = {resizer.scaled_size(tw, th, s) for _,(tw,th) in PRESETS for s in resizer.SCALE_OPTIONS}
+    targets |= {(pw, round(th*pw/tw)) for _,(tw,th) in PRESETS for pw in (resizer.FOCAL_PROXY_SIDE, 220)}
+    bad = []
+    for sw in range(400, 6001, 37):
+        for sh in (sw*2//3, sw*3//4, sw*9//16, sw, sw*4//3):
+            for w,h in targets:
+                nw, nh = resizer.cover_size((sw, sh), w, h)
+                x0, y0, x1, y1 = resizer.cover_box((sw, sh), nw, nh, w, h, (0.0, 1.0))
+                if min(x0, y0) < 0 or x1 > sw + 1e-6 or y1 > sh + 1e-6: bad.append(((sw, sh), (w, h)))
+    for size in ((1504, 1128), (1000, 666), (600, 450)):
+        im = Image.new("RGB", size)
+        bad += [(size, (w, h)) for w,h in targets if resizer.resize_cover(im, w, h).size != (w, h)]
+    print(f"격자 확인: {'통과' if not bad else f'실패 {len(bad)}건 (예: {bad[:3]})'}")
+    print(f"cover 리사이즈 — {args.side}x{args.side} 소스, 배율 {args.scale}")
+    print(f"{'preset':<22} {'size':>10} {'full ms':>8} {'box ms':>8} {'max diff':>9} {'mean diff':>9}")
+    for name,(tw,th) in PRESETS:
+        w, h = resizer.scaled_size(tw, th, args.scale)
+        t_full, a = timed(lambda: full_then_crop(w, h))
+        t_box, b = timed(lambda: resizer.resize_cover(src, w, h))
+        d = np.abs(np.asarray(a, dtype=np.int16) - np.asarray(b, dtype=np.int16))
+        print(f"{name:<22} {f'{w}x{h}':>10} {t_full*1000:>8.1f} {t_box*1000:>8.1f} {int(d.max()):>9} {float(d.mean()):>9.3f}")
+
+def bench_pad(args):
+    src = resizer.prepare_source(sample_image(6000, 4000))
+    sizes = preset_sizes(args.scale)
+    def per_target():
+        # 비교용: 타깃마다 전체 해상도로 cover → 블러 (반경은 타깃 크기에 비례)
+        for w,h in sizes:
+            bg = resizer.resize_cover(src, w, h).filter(ImageFilter.GaussianBlur(max(w,h)/resizer.PAD_BLUR_SIDE*resizer.PAD_BLUR_RADIUS))
+            nw, nh = resizer.contain_size(src.size, w, h)
+            bg.paste(src.resize((nw,nh), Image.LANCZOS, reducing_gap=2.0), ((w-nw)//2, (h-nh)//2))
+    def once():
+        fill = resizer.pad_fill(src, "blur")
+        for w,h in sizes: resizer.resize_contain(src, w, h, fill=fill)
+    print(f"contain 블러 여백 — 6000x4000 소스, 프리셋 {len(sizes)}종, 배율 {args.scale}")
+    for label, fn in (("타깃마다 전체 해상도 블러", per_target), ("저해상도 1회 + 확대", once)):
+        dt, _ = timed(fn, repeat=1)
+        print(f"{label:<20} {dt*1000:>8.0f} ms")
+
+def bench_alpha(args):
+    import numpy as np
+    # 부드러운 가장자리(블러된 알파)를 가진 누끼 이미지 — 가장자리 색 번짐/어두운 테가 드러나는 경우
+    src = sample_image(args.side, args.side*2//3).convert("RGBA")
+    mask = Image.new("L", src.size, 0)
+    ImageDraw.Draw(mask).ellipse((src.width//6, src.height//6, src.width*5//6, src.height*5//6), fill=255)
+    src.putalpha(mask.filter(ImageFilter.GaussianBlur(src.width//200)))
+    src = resizer.prepare_source(src)
+    sizes = preset_sizes(args.scale)
+    def per_target():
+        return [resizer.ensure_rgb(resizer.resize_cover(src, w, h)) for w,h in sizes]
+    def once():
+        flat = resizer.flatten_alpha(src)
+        return [resizer.resize_cover(flat, w, h) for w,h in sizes]
+    print(f"알파 합성 — {src.width}x{src.height} RGBA 소스, 프리셋 {len(sizes)}종, 배율 {args.scale}")
+    (t_a, a), (t_b, b) = timed(per_target), timed(once)
+    d = max(int(np.abs(np.asarray(x, dtype=np.int16) - np.asarray(y, dtype=np.int16)).max()) for x,y in zip(a, b))
+    print(f"{'타깃마다 합성 (RGBa 리사이즈)':<24} {t_a*1000:>8.0f} ms")
+    print(f"{'소스에서 한 번 합성 (RGB 리사이즈)':<24} {t_b*1000:>8.0f} ms   최대 픽셀 차이 {d}")
+
+def _tiled_run(path, sizes, tiled, q):
+    # 별도 프로세스에서 한 번 렌더하고 (초, 최대 RSS MB)를 돌려줌 — 프로세스 풀은 끄고 이 프로세스 안에서만 측정
+    # (ru_maxrss는 fork 전 부모의 값이 남으므로 exec 이후 기준인 /proc의 VmHWM 사용 — Linux 전용)
+    resizer.TILED_MIN_MP = resizer.TILED_MIN_MP if tiled else 0; resizer.PROCESS_POOL_MIN_MP = 0
+    t = time.perf_counter()
+    src = resizer.file_loader(path)(sizes)  # CLI와 같은 로더 — 열었던 원본(디코드된 코어)을 렌더 전에 놓아줌
+    outs = list(resizer.render_all(src, sizes, "jpg", 88, (0.5, 0.5)))
+    hwm = next(int(l.split()[1]) for l in open("/proc/self/status") if l.startswith("VmHWM:"))
+    q.put((time.perf_counter()-t, hwm/1024, type(src).__name__, len(outs)))
+
+def bench_tiled(args):
+    import multiprocessing
+    w, h = args.width, args.height
+    tile = sample_image(2000, 1500)
+    big = Image.new("RGB", (w, h))
+    for y in range(0, h, tile.height):
+        for x in range(0, w, tile.width): big.paste(tile, (x, y))
+    # --size: 프리셋 대신 작은 타깃 하나 — reduce 배수 k가 커지는 경우(스트립 높이가 k와 무관한지) 확인용
+    sizes = [tuple(int(v) for v in args.size.lower().split("x"))] if args.size else preset_sizes(args.scale)
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "big.tiff"); big.save(path); del big
+        print(f"대형 소스 — {w}x{h} ({w*h/1e6:.0f} MP) 무압축 TIFF, "
+              + (f"타깃 {args.size}" if args.size else f"프리셋 {len(sizes)}종, 배율 {args.scale}"))
+        print(f"{'mode':<8} {'source':<12} {'s':>7} {'peak MB':>9}")
+        for label, tiled in (("full", False), ("tiled", True)):
+            q = ctx.Queue(); p = ctx.Process(target=_tiled_run, args=(path, sizes, tiled, q)); p.start()
+            dt, rss, kind, _ = q.get(); p.join()
+            print(f"{label:<8} {kind:<12} {dt:>7.2f} {rss:>9.0f}")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="resizer 파이프라인 벤치마크")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("zip", help="ZIP 압축 정책별 시간/크기"); p.set_defaults(fn=bench_zip)
+    p.add_argument("--scale", type=float, default=2.0)
+    p = sub.add_parser("smart", help="스마트 크롭 초점 정확도/시간"); p.set_defaults(fn=bench_smart)
+    p.add_argument("--images", type=int, default=40)
+    p.add_argument("--seed", type=int, default=7)
+    p = sub.add_parser("formats", help="포맷/노력별 용량·인코딩 시간"); p.set_defaults(fn=bench_formats)
+    p.add_argument("--quality", type=int, default=80)
+    p.add_argument("--scale", type=float, default=2.0)
+    p = sub.add_parser("jpeg", help="JPEG 프로그레시브/서브샘플링 비교"); p.set_defaults(fn=bench_jpeg)
+    p.add_argument("--preset", default="Landing Page_banner", choices=[n for n,_ in PRESETS])
+    p.add_argument("--quality", type=int, default=88)
+    p = sub.add_parser("cover", help="크롭 후 리샘플 vs 리샘플 후 크롭"); p.set_defaults(fn=bench_cover)
+    p.add_argument("--side", type=int, default=4000)
+    p.add_argument("--scale", type=float, default=3.0)
+    p = sub.add_parser("pad", help="contain 블러 여백 생성 시간"); p.set_defaults(fn=bench_pad)
+    p.add_argument("--scale", type=float, default=3.0)
+    p = sub.add_parser("alpha", help="알파 합성 위치별 시간/픽셀 차이"); p.set_defaults(fn=bench_alpha)
+    p.add_argument("--side", type=int, default=6000)
+    p.add_argument("--scale", type=float, default=2.0)
+    p = sub.add_parser("tiled", help="대형 소스 전체 디코드 vs 스트립 처리"); p.set_defaults(fn=bench_tiled)
+    p.add_argument("--width", type=int, default=16000)
+    p.add_argument("--height", type=int, default=10000)
+    p.add_argument("--scale", type=float, default=2.0)
+    p.add_argument("--size", default=None, metavar="WxH", help="프리셋 대신 이 사이즈 하나만 (예: 100x100)")
+    args = ap.parse_args(argv)
+    args.fn(args)
+
+if __name__ == "__main__":
+    main()
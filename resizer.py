@@ -0,0 +1,1173 @@
+# resizer.py — 리사이즈/인코딩 파이프라인 (Streamlit 비의존, 프로세스 워커에서도 import)
+#   python resizer.py ./key_visuals -o ./out --scale 2 --format jpg     # 폴더 일괄 추출 (CLI)
+#   python resizer.py ./drops -o ./out --watch                          # 새로 들어온/바뀐 이미지만 계속 추출
+
+import io, os, sys, json, math, time, threading, zipfile, hashlib
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from PIL import Image, ImageOps, ImageColor, ImageFilter
+try:
+    import pillow_avif  # noqa: F401 — Pillow 11.2 미만에서 AVIF 저장을 추가하는 플러그인 (선택)
+except ImportError:
+    pass
+
+VALID_EXTS = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tiff"}
+Image.init()
+AVIF_SUPPORTED = "AVIF" in Image.SAVE  # Pillow 빌드/플러그인에 AVIF 인코더가 있을 때만 노출
+OUTPUT_FORMATS = ["jpg", "jpeg", "png", "webp"] + (["avif"] if AVIF_SUPPORTED else [])
+# 용량 상한(max_bytes)이 있는 타깃: 이 포맷들만 품질을 낮춰 맞추고, 품질은 이 값 아래로는 내리지 않음
+BUDGET_FORMATS = {"jpg", "jpeg", "webp", "avif"}
+# JPEG 크로마 서브샘플링 선택지 (None: Pillow 기본 = 4:2:0) / metadata="keep"일 때 출력에 옮겨 쓰는 소스 메타데이터
+JPEG_SUBSAMPLING = ["4:4:4", "4:2:0"]
+META_KEYS = ("exif", "icc_profile")
+# 임베디드 ICC 프로파일(CMYK·Display P3·Adobe RGB 등)이 있는 소스는 준비 단계에서 한 번 sRGB로 변환 — 입력 → 출력 모드
+ICC_MODES = {"CMYK": "RGB", "RGB": "RGB", "RGBA": "RGBA"}
+ICC_TRANSFORM_CACHE = 32  # 빌드한 변환을 (프로파일 해시, 입력 모드, 출력 모드)별로 보관할 개수
+# PNG 압축 정책 → save() 인자. optimize는 zlib 전략을 여러 번 시도하므로 max에서만 사용
+PNG_LEVELS = {"fast": {"compress_level": 1}, "balanced": {"compress_level": 6},
+              "max": {"compress_level": 9, "optimize": True}}
+BUDGET_MIN_QUALITY = 30
+# 인코딩 노력(effort) 범위와 기본값 — 클수록 느리지만 작게. WebP는 method, AVIF는 speed(=10-effort)로 전달
+EFFORT_RANGES = {"webp": (0, 6, 4), "avif": (0, 10, 4)}
+PRESETS = [
+    ("Landing Page_Thumbnail", (600, 350)),
+    ("Landing Page_banner", (1920, 440)),
+    ("Speaker", (250, 250)),
+    ("List Thumbnail", (720, 420)),
+    ("Carousel Banner", (1200, 370)),
+    ("Email Header", (600, 280)),
+]
+SCALE_OPTIONS = [0.5, 1.0, 1.5, 2.0, 2.5, 3.0]
+# 피라미드 레벨은 최종 리사이즈 크기보다 최소 이 배율 이상 커야 사용 (클수록 원본 직접 LANCZOS와 가까움, 0이면 끔)
+PYRAMID_MIN_RATIO = 2.0
+
+def container_cpus() -> int:
+    # 컨테이너 CPU 제한(cgroup v2 cpu.max) → affinity → cpu_count 순으로 확인
+    try:
+        quota, period = open("/sys/fs/cgroup/cpu.max").read().split()
+        if quota != "max": return max(1, int(int(quota)/int(period)))
+    except (OSError, ValueError):
+        pass
+    try: return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError: return os.cpu_count() or 1
+
+# 사이즈별 리사이즈+인코딩 스레드 수 (Pillow는 resize/encode 동안 GIL을 풀어줍니다)
+RENDER_WORKERS = container_cpus()
+# 준비된 소스가 이 메가픽셀 이상이면 프로세스 풀 + 공유 메모리로 렌더 (0이면 끔)
+PROCESS_POOL_MIN_MP = float(os.environ.get("RESIZER_PROCESS_MIN_MP", "40"))
+# 공유 메모리에 올릴 때의 픽셀 레이아웃 — frombuffer가 복사 없이 감쌀 수 있는 모드만 사용
+SHM_MODES = {"RGB": "RGBX", "RGBA": "RGBA", "L": "L"}
+# 헤더 기준 이 메가픽셀 이상인 무압축 TIFF/BMP/PPM은 스트립 처리(TiledSource) — 소스 전체를 한 Image로 들고 있지 않음 (0이면 끔)
+TILED_MIN_MP = float(os.environ.get("RESIZER_TILED_MIN_MP", "150"))
+TILE_STRIP_ROWS = 256   # 한 번에 읽는 소스 행 수(strip_step) / 타깃별 출력 스트립도 이 정도 (축소된) 소스 행을 덮도록
+LANCZOS_SUPPORT = 3.0   # LANCZOS 커널 반경(출력 픽셀 기준) — 스트립 경계에서 이만큼 위아래 행을 겹쳐 읽음
+# 스트립으로 읽을 수 있는 무압축 소스만 Pillow 디코드 폭탄 한도(Image.MAX_IMAGE_PIXELS, 약 89MP)를 넘어 이 값까지 허용
+# 전역 한도는 바꾸지 않음 — 전체 디코드가 필요한 포맷과 같은 프로세스의 다른 코드는 Pillow 한도 그대로
+STREAM_MAX_MP = float(os.environ.get("RESIZER_MAX_MP", "1000"))
+STREAM_FORMATS = ("TIFF", "BMP", "PPM")  # raw_strip_reader가 읽을 수 있는 무압축 포맷
+# 무압축 소스의 raw 디코더 모드 → 픽셀당 비트 (스트립 오프셋 계산용)
+RAW_BITS = {"L": 8, "RGB": 24, "BGR": 24, "RGBX": 32, "BGRX": 32, "RGBA": 32, "BGRA": 32}
+# 동시에 실행하는 내보내기 수와 그 작업들의 예상 메모리 합 상한 — 넘치는 작업은 FIFO로 대기 (AdmissionGate)
+EXPORT_SLOTS = int(os.environ.get("RESIZER_EXPORT_SLOTS", "2"))
+EXPORT_BUDGET_MB = float(os.environ.get("RESIZER_EXPORT_BUDGET_MB", "2048"))
+# 이미 엔트로피 코딩된 출력 포맷 — deflate로 거의 줄지 않으므로 ZIP에는 무압축(STORED)으로 저장
+ENTROPY_CODED_FORMATS = {"jpg", "jpeg", "png", "webp", "avif"}
+# 스마트 크롭: 초점 계산용 프록시 긴 변(px), 블록 크기, 남길 상위 블록 분위수, 중앙 우대 가우시안 폭
+FOCAL_PROXY_SIDE = 256
+FOCAL_BLOCK = 8
+FOCAL_TOP_QUANTILE = 0.9
+FOCAL_CENTER_SIGMA = 0.6
+# 맞춤 방식: cover(채우고 크롭) / contain(전체가 보이게 맞추고 여백을 pad로 채움)
+FIT_MODES = ["cover", "contain"]
+PAD_BLUR_SIDE = 96    # 블러 여백 배경은 이 긴 변의 저해상도 소스에서 한 번만 만들고 타깃 크기로 확대
+PAD_BLUR_RADIUS = 4   # 그 해상도 기준 가우시안 반경
+# 사용자가 지정한 초점 저장 위치 (콘텐츠 해시 기준) — 앱·배치·CLI가 같은 파일을 공유
+FOCAL_STORE_PATH = os.environ.get("RESIZER_FOCAL_STORE") or os.path.join(
+    os.path.expanduser("~"), ".cache", "image-resizer", "focal_points.json")
+
+
+# ---- 이름/사이즈 ----
+def sanitize_label(s: str) -> str:
+    bad='\\/:*?"<>|'
+    out=s.strip().replace(" ","_")
+    for ch in bad: out=out.replace(ch,"")
+    return out
+
+def parse_bytes(text: str):
+    # "150KB", "1.5MB", "80000" → 바이트 수 (KB/MB는 1024 단위), 빈 값은 None
+    t = text.strip().upper().replace(" ","").removesuffix("B")
+    if not t: return None
+    mult = {"K": 1024, "M": 1024*1024}.get(t[-1], 1)
+    v = float(t[:-1] if mult > 1 else t)*mult
+    if not math.isfinite(v): raise ValueError(text)  # inf·1e999는 int()에서 OverflowError가 되므로 여기서 거부
+    n = int(v)
+    if n <= 0: raise ValueError(text)
+    return n
+
+def format_bytes(n: int) -> str:
+    return f"{n/1024/1024:.2f}MB" if n >= 1024*1024 else f"{n/1024:.1f}KB"
+
+def parse_custom_sizes(text: str):
+    # 한 줄에 하나씩 "라벨, WxH[, 용량 상한]" → ([(label, w, h, max_bytes)], [무시된 줄])
+    custom=[]; ignored=[]
+    for line in text.splitlines():
+        line=line.strip()
+        if not line: continue
+        try:
+            left,right=line.split(",",1)
+            label=left.strip()
+            right,_,budget = right.partition(",")
+            sw,sh = right.lower().replace("×","x").replace(" ","").split("x",1)
+            if int(sw) <= 0 or int(sh) <= 0: raise ValueError(line)  # 0·음수 크기는 무시된 줄로
+            custom.append((label,int(sw),int(sh),parse_bytes(budget)))
+        except Exception:
+            ignored.append(line)
+    return custom, ignored
+
+def scaled_size(tw: int, th: int, scale: float):
+    return max(1, int(round(tw*float(scale)))), max(1, int(round(th*float(scale))))
+
+def output_name(title: str, label: str, w: int, h: int, fmt: str) -> str:
+    return f"{sanitize_label(title)}_{sanitize_label(label)}_{w}x{h}.{fmt}"
+
+
+_icc_transforms = OrderedDict()
+_icc_lock = threading.Lock()
+_srgb = None
+
+def srgb_profile():
+    # 출력 프로파일 (ImageCmsProfile, 임베드용 바이트) — 프로세스당 한 번 생성
+    global _srgb
+    if _srgb is None:
+        from PIL import ImageCms
+        p = ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB")); _srgb = (p, p.tobytes())
+    return _srgb
+
+def icc_transform(icc: bytes, mode: str):
+    # 소스 프로파일 → sRGB 변환을 (프로파일 해시, 입력 모드, 출력 모드)마다 한 번만 빌드 (빌드가 적용보다 훨씬 비쌈)
+    # None: 이미 sRGB이거나 읽을 수 없는 프로파일 → 변환하지 않음 / NOCACHE로 빌드해 여러 스레드가 같은 변환을 공유
+    key = (hashlib.blake2b(icc, digest_size=16).hexdigest(), mode, ICC_MODES[mode])
+    with _icc_lock:
+        if key in _icc_transforms:
+            _icc_transforms.move_to_end(key); return _icc_transforms[key]
+    from PIL import ImageCms
+    try:
+        prof = ImageCms.ImageCmsProfile(io.BytesIO(icc))
+        t = None if "srgb" in ImageCms.getProfileDescription(prof).lower() else \
+            ImageCms.buildTransform(prof, srgb_profile()[0], mode, ICC_MODES[mode], flags=ImageCms.Flags.NOCACHE)
+    except (ImageCms.PyCMSError, OSError, ValueError, TypeError):
+        t = None
+    with _icc_lock:
+        _icc_transforms[key] = t
+        while len(_icc_transforms) > ICC_TRANSFORM_CACHE: _icc_transforms.popitem(last=False)
+    return t
+
+def to_srgb(im: Image.Image, icc=None) -> Image.Image:
+    # icc(기본: im의 임베디드 프로파일) 기준으로 sRGB 변환 — 결과에는 sRGB 프로파일을 달아 metadata="keep"일 때 그대로 임베드
+    icc = icc or im.info.get("icc_profile")
+    t = icc_transform(icc, im.mode) if icc and im.mode in ICC_MODES else None
+    if t is None: return im
+    from PIL import ImageCms
+    out = ImageCms.applyTransform(im, t)
+    out.info = {**im.info, "icc_profile": srgb_profile()[1]}
+    return out
+
+def prepare_source(im: Image.Image, sizes=None) -> Image.Image:
+    # 디코드·EXIF 회전·모드 변환은 소스당 한 번만 — 이후 모든 사이즈가 이 이미지를 공유
+    # sizes(출력 WxH 목록)를 주면 JPEG는 그 중 가장 큰 출력을 덮는 DCT 축소(1/2·1/4·1/8)로 디코드
+    if sizes and im.format == "JPEG":
+        swap = im.getexif().get(0x0112) in (5,6,7,8)
+        sw, sh = im.size[::-1] if swap else im.size
+        s = max(max(w/sw, h/sh) for w,h in sizes)
+        need = (math.ceil(sw*s), math.ceil(sh*s))
+        im.draft(im.mode, need[::-1] if swap else need)
+    im = to_srgb(ImageOps.exif_transpose(im))  # CMYK는 프로파일이 있으면 여기서 RGB로
+    if im.mode not in ("RGB","RGBA","L"):
+        has_alpha = im.mode in ("LA","PA") or "transparency" in im.info
+        im = im.convert("RGBA" if has_alpha else "RGB")
+    im.load()
+    return im
+
+def make_proxy(im: Image.Image, max_side: int) -> Image.Image:
+    # 미리보기용 저해상도 소스 — JPEG는 DCT 축소로 디코드하고 긴 변을 max_side로 맞춤
+    r = max_side/max(im.size)
+    if r < 1 and im.format == "JPEG":
+        im.draft(im.mode, (math.ceil(im.width*r), math.ceil(im.height*r)))
+    im = open_source(im)
+    if isinstance(im, TiledSource): return im.proxy(max_side)
+    im.thumbnail((max_side, max_side), Image.LANCZOS, reducing_gap=PYRAMID_MIN_RATIO or None)
+    return im
+
+def cover_size(src_size, w: int, h: int):
+    sw, sh = src_size
+    # 부동소수 오차로 int()가 타깃보다 1px 작아지면 cover_box의 크롭 창이 음수가 되므로 최소 (w, h)
+    scale = max(w/sw, h/sh)
+    return max(w, round(sw*scale)), max(h, round(sh*scale))
+
+def build_pyramid(im: Image.Image, sizes, ratio: float = PYRAMID_MIN_RATIO):
+    # 1/2 박스 축소(reduce) 레벨을 소스당 한 번만 생성 — 가장 작은 출력에 필요한 레벨까지만
+    levels=[im]
+    if not ratio or not sizes: return levels
+    min_w = min(cover_size(im.size, w, h)[0] for w,h in sizes)*ratio
+    min_h = min(cover_size(im.size, w, h)[1] for w,h in sizes)*ratio
+    while levels[-1].width//2 >= min_w and levels[-1].height//2 >= min_h:
+        levels.append(levels[-1].reduce(2))
+    return levels
+
+def pick_level(levels, nw: int, nh: int, ratio: float = PYRAMID_MIN_RATIO) -> Image.Image:
+    # 최종 LANCZOS 입력으로 쓸 수 있는 가장 작은 레벨
+    for lv in reversed(levels[1:]):
+        if lv.width >= nw*ratio and lv.height >= nh*ratio: return lv
+    return levels[0]
+
+def contain_size(src_size, w: int, h: int):
+    sw, sh = src_size
+    scale = min(w/sw, h/sh)
+    return max(1,min(w,round(sw*scale))), max(1,min(h,round(sh*scale)))
+
+def _resize(im: Image.Image, nw: int, nh: int, levels=None) -> Image.Image:
+    # levels가 없으면 Pillow의 reducing_gap으로 같은 비율의 사전 축소를 대신합니다
+    if levels:
+        return pick_level(levels, nw, nh).resize((nw,nh), Image.LANCZOS)
+    return im.resize((nw,nh), Image.LANCZOS, reducing_gap=PYRAMID_MIN_RATIO or None)
+
+def cover_box(src_size, nw: int, nh: int, w: int, h: int, focus=None):
+    # (nw, nh)로 확대/축소한 뒤 잘라낼 w×h 창을 src_size 좌표의 박스로 환산
+    # focus=(fx, fy)는 0~1 비율 좌표 — 크롭 창을 이 점 중심에 최대한 맞춤 (None이면 중앙)
+    fx, fy = focus or (0.5, 0.5)
+    x = min(max(math.floor(fx*nw - w/2), 0), nw-w)
+    y = min(max(math.floor(fy*nh - h/2), 0), nh-h)
+    sx, sy = src_size[0]/nw, src_size[1]/nh
+    return (x*sx, y*sy, (x+w)*sx, (y+h)*sy)
+
+def resize_cover(im: Image.Image, w: int, h: int, levels=None, focus=None) -> Image.Image:
+    # im은 prepare_source()를 거친 이미지여야 합니다 / levels는 build_pyramid(im, ...) 결과
+    # 크롭 창을 먼저 소스 좌표로 계산해 그 영역만 리샘플 (box=) — 버려질 픽셀은 스케일하지 않으므로
+    # 비용·메모리가 출력 크기에 비례. 전체를 (nw, nh)로 줄인 뒤 자르는 것과 결과는 같음
+    nw, nh = cover_size(im.size, w, h)
+    if levels:
+        lv = pick_level(levels, nw, nh)
+        return lv.resize((w,h), Image.LANCZOS, box=cover_box(lv.size, nw, nh, w, h, focus))
+    return im.resize((w,h), Image.LANCZOS, box=cover_box(im.size, nw, nh, w, h, focus),
+                     reducing_gap=PYRAMID_MIN_RATIO or None)
+
+def pad_fill(im: Image.Image, pad: str = "#ffffff"):
+    # 여백 설정("blur" 또는 색) → 소스당 한 번 준비하는 여백 (RGB 색 튜플 또는 저해상도 블러 이미지)
+    if pad != "blur": return ImageColor.getrgb(pad)[:3]
+    r = PAD_BLUR_SIDE/max(im.size)
+    small = im if r >= 1 else im.resize((max(1, round(im.width*r)), max(1, round(im.height*r))),
+                                        Image.BOX, reducing_gap=PYRAMID_MIN_RATIO or None)
+    return ensure_rgb(small).filter(ImageFilter.GaussianBlur(PAD_BLUR_RADIUS))
+
+def resize_contain(im: Image.Image, w: int, h: int, levels=None, fill=(255,255,255)) -> Image.Image:
+    # 전체가 보이게 축소해 w×h 가운데에 배치 — fill은 pad_fill() 결과 (블러 배경은 저해상도에서 확대만)
+    nw, nh = contain_size(im.size, w, h)
+    im2 = _resize(im, nw, nh, levels)
+    base = resize_cover(fill, w, h) if isinstance(fill, Image.Image) else Image.new("RGB", (w,h), fill)
+    return ensure_rgb(im2, base, ((w-nw)//2, (h-nh)//2))
+
+def resize_fit(im: Image.Image, w: int, h: int, levels=None, focus=None, fit: str = "cover", fill=(255,255,255)):
+    if fit == "contain": return resize_contain(im, w, h, levels, fill)
+    return resize_cover(im, w, h, levels, focus)
+
+def focal_point(im: Image.Image, side: int = FOCAL_PROXY_SIDE):
+    # 엣지 에너지 × 블록 엔트로피로 관심 영역을 찾아 (fx, fy) 반환 — side px 프록시에서 NumPy로 계산
+    import numpy as np
+    r = side/max(im.size)
+    small = im.convert("L") if r >= 1 else im.resize((max(8, round(im.width*r)), max(8, round(im.height*r))),
+                                                      Image.BOX, reducing_gap=PYRAMID_MIN_RATIO or None).convert("L")
+    a = np.asarray(small, dtype=np.float32)
+    b = FOCAL_BLOCK; bh, bw = a.shape[0]//b, a.shape[1]//b
+    if bh == 0 or bw == 0: return (0.5, 0.5)
+    a = a[:bh*b, :bw*b]
+    energy = np.zeros_like(a)
+    energy[:, 1:] += np.abs(np.diff(a, axis=1)); energy[1:, :] += np.abs(np.diff(a, axis=0))
+    energy = energy.reshape(bh, b, bw, b).mean(axis=(1,3))
+    q = (a // 16).astype(np.int64).reshape(bh, b, bw, b).transpose(0, 2, 1, 3).reshape(bh, bw, b*b)
+    counts = np.stack([(q == k).sum(axis=-1) for k in range(16)], axis=-1) / float(b*b)
+    entropy = -(counts * np.log2(np.where(counts > 0, counts, 1))).sum(axis=-1)
+    score = energy * entropy
+    if score.max() <= 0: return (0.5, 0.5)
+    # 상위 블록만 남기고 가운데 쪽을 살짝 우대한 가중 중심
+    ys, xs = (np.arange(bh) + 0.5)/bh, (np.arange(bw) + 0.5)/bw
+    prior = np.exp(-((ys[:,None]-0.5)**2 + (xs[None,:]-0.5)**2) / (2*FOCAL_CENTER_SIGMA**2))
+    weight = np.where(score >= np.quantile(score, FOCAL_TOP_QUANTILE), score, 0) ** 2 * prior
+    total = weight.sum()
+    return (float((weight.sum(axis=0)*xs).sum()/total), float((weight.sum(axis=1)*ys).sum()/total))
+
+# 크롭 방식 → 소스당 한 번 초점을 계산하는 함수 (모든 사이즈가 같은 초점을 공유)
+CROP_STRATEGIES = {
+    "center": lambda im: (0.5, 0.5),
+    "smart": focal_point,
+}
+
+def crop_focus(im: Image.Image, crop: str = "center"):
+    return CROP_STRATEGIES[crop](im)
+
+def keep_meta(dst: Image.Image, src: Image.Image) -> Image.Image:
+    # 새로 만든 이미지에 소스의 EXIF/ICC만 옮김 (transparency 등은 제외)
+    for k in META_KEYS:
+        if k in src.info: dst.info[k] = src.info[k]
+    return dst
+
+def ensure_rgb(img: Image.Image, bg=(255,255,255), box=None) -> Image.Image:
+    # bg는 배경색 또는 배경 이미지(RGB, 그 위에 바로 합성) — box는 배경 이미지 위 img의 좌상단 (여백 채우기용)
+    # RGBA/LA는 이미지 자체를 마스크로 넘겨 알파 밴드를 따로 복사하지 않음 (split()은 모든 채널을 새로 할당)
+    if img.mode == "RGB" and not isinstance(bg, Image.Image): return img
+    alpha = img.mode in ("RGBA","LA") or (img.mode=="P" and "transparency" in img.info)
+    if alpha and img.mode == "P": img = img.convert("RGBA")
+    if isinstance(bg, Image.Image):
+        if alpha: bg.paste(img, box, img)
+        else: bg.paste(img.convert("RGB") if img.mode!="RGB" else img, box)
+        return keep_meta(bg, img)
+    if alpha: return flatten_alpha(img, bg)
+    return img.convert("RGB")
+
+def flatten_alpha(im: Image.Image, bg=(255,255,255)) -> Image.Image:
+    # 알파가 있는 이미지를 bg 색 위에 합성한 RGB — 소스 해상도에서 한 번 하면 이후 리사이즈는 3채널만
+    # 단색 위 합성은 프리멀티플라이 공간에서 선형이므로 "합성 후 리사이즈" = "프리멀티플라이 리사이즈 후 합성" (가장자리 어두운 테 없음)
+    if im.mode not in ("RGBA","LA"): return im
+    base = Image.new("RGB", im.size, bg)
+    base.paste(im, (0, 0), im)
+    return keep_meta(base, im)
+
+def flatten_color(fmt: str, fit: str = "cover", fill=(255,255,255)):
+    # 출력에 알파가 남지 않을 때 소스를 미리 합성할 배경색 — None이면 알파 유지
+    # cover는 JPEG(흰 배경), contain은 단색 여백이면 그 색 (블러 여백은 타깃마다 배경이 달라 미리 합성하지 않음)
+    if fit == "contain": return None if isinstance(fill, Image.Image) else fill
+    return (255,255,255) if fmt in ("jpg","jpeg") else None
+
+def encode_image(out: Image.Image, fmt: str, quality: int, fp=None, opts=None):
+    # fp(파일 객체)를 주면 그곳에 바로 쓰고, 없으면 인코딩된 바이트를 반환
+    # opts: 포맷별 인코더 옵션 dict — effort(WebP/AVIF, EFFORT_RANGES 참고), progressive·subsampling(JPEG),
+    #       metadata("keep"이면 소스의 EXIF/ICC를 그대로, 기본은 제거), png(PNG_LEVELS, 기본 balanced)·quantize(PNG 팔레트 색 수)
+    opts = opts or {}
+    bio = fp if fp is not None else io.BytesIO()
+    meta = {k: out.info[k] for k in META_KEYS if k in out.info} if opts.get("metadata") == "keep" else {}
+    if fmt in ("jpg","jpeg"):
+        extra = {"subsampling": opts["subsampling"]} if opts.get("subsampling") else {}
+        ensure_rgb(out).save(bio, format="JPEG", quality=int(quality), optimize=True,
+                             progressive=bool(opts.get("progressive")), **extra, **meta)
+    elif fmt in EFFORT_RANGES:
+        effort = int(opts.get("effort", EFFORT_RANGES[fmt][2]))
+        if out.mode not in ("RGB","RGBA"):
+            out = out.convert("RGBA" if out.mode in ("LA","PA") or "transparency" in out.info else "RGB")
+        if fmt == "webp": out.save(bio, format="WEBP", quality=int(quality), method=effort, **meta)
+        else: out.save(bio, format="AVIF", quality=int(quality), speed=10-effort, **meta)
+    else:
+        if opts.get("quantize") and out.mode not in ("1","L","P"):
+            # 평면 그래픽용 팔레트 PNG — FASTOCTREE는 알파도 그대로 다룸
+            out = (out.convert("RGBA") if out.mode == "LA" else out).quantize(int(opts["quantize"]),
+                                                                             method=Image.Quantize.FASTOCTREE)
+        # PNG 저장은 icc_profile 인자가 없으면 out.info의 프로파일을 그대로 쓰므로 유지하지 않을 때는 명시적으로 제거
+        out.save(bio, format="PNG", **PNG_LEVELS[opts.get("png", "balanced")], **{"icc_profile": None, **meta})
+    return None if fp is not None else bio.getvalue()
+
+def encode_budget(out: Image.Image, fmt: str, quality: int, max_bytes=None, opts=None):
+    # max_bytes 이하가 되는 가장 높은 품질(quality가 상한)을 이진 탐색 → (바이트, 선택된 품질, 인코딩 ms)
+    # 리사이즈된 픽셀을 그대로 두고 메모리에서만 다시 인코딩 / 최저 품질로도 넘으면 최저 품질 결과를 반환
+    t0 = time.perf_counter()
+    if not max_bytes or fmt not in BUDGET_FORMATS:
+        return encode_image(out, fmt, quality, opts=opts), quality, (time.perf_counter()-t0)*1000
+    if fmt in ("jpg","jpeg"): out = ensure_rgb(out)  # 패스마다 알파 합성을 반복하지 않도록
+    data = encode_image(out, fmt, quality, opts=opts)
+    lo, hi = BUDGET_MIN_QUALITY, quality-1; q = quality; best = None
+    if len(data) <= max_bytes: best, lo = (data, q), hi+1
+    while lo <= hi:
+        q = (lo+hi)//2; data = encode_image(out, fmt, q, opts=opts)
+        if len(data) <= max_bytes: best, lo = (data, q), q+1
+        else: hi = q-1
+    data, q = best or (data, q)  # 맞는 품질이 없으면 마지막 시도 = 최저 품질
+    return data, q, (time.perf_counter()-t0)*1000
+
+def render_target(src: Image.Image, levels, w: int, h: int, fmt: str, quality: int, focus=None, fit: str = "cover",
+                  fill=(255,255,255), opts=None, max_bytes=None):
+    return encode_budget(resize_fit(src, w, h, levels, focus, fit, fill), fmt, quality, max_bytes, opts)
+
+
+# ---- 대형 소스 (스트립 처리) ----
+def raw_strip_reader(im: Image.Image):
+    # 무압축(raw) TIFF/BMP/PPM 등이면 read(y0, y1) → 그 행 범위만 파일에서 읽은 Image, 아니면 None
+    # EXIF 회전이 있거나 변환이 필요한 모드는 None (prepare_source로 전체 디코드)
+    # (타일 목록을 먼저 확인 — PNG 등은 getexif()가 전체를 디코드하면서 tile을 비움)
+    if im.mode not in SHM_MODES or not im.tile or any(t[0] != "raw" for t in im.tile): return None
+    tiles, raw_tiles = [], list(im.tile)
+    if im.getexif().get(0x0112, 1) != 1: return None
+    for _, (x0,y0,x1,y1), offset, args in raw_tiles:
+        rawmode, stride, orient = (args, 0, 1) if isinstance(args, str) else (tuple(args)+(0, 1))[:3]
+        if rawmode not in RAW_BITS or orient not in (1, -1): return None
+        tiles.append((x0, y0, x1, y1, offset, rawmode, stride or math.ceil((x1-x0)*RAW_BITS[rawmode]/8), orient))
+    src, mode, width = im.filename or im.fp, im.mode, im.width
+    lock = threading.Lock()
+    def read(ry0: int, ry1: int) -> Image.Image:
+        strip = None
+        with lock, (open(src, "rb") if isinstance(src, str) else _keep_open(src)) as fp:
+            for x0, y0, x1, y1, offset, rawmode, stride, orient in tiles:
+                r0, r1 = max(ry0, y0), min(ry1, y1)
+                if r0 >= r1: continue
+                # 아래→위로 저장된 경우(BMP)는 파일에서 역순 구간을 읽어 raw 디코더가 뒤집게 함
+                fp.seek(offset + ((r0-y0) if orient == 1 else (y1-r1))*stride)
+                part = Image.frombytes(mode, (x1-x0, r1-r0), fp.read((r1-r0)*stride), "raw", rawmode, stride, orient)
+                # 타일 하나가 요청 범위를 다 덮으면(대부분의 TIFF/BMP) 빈 캔버스·paste 없이 디코드 결과를 그대로
+                if (x0, r0, x1, r1) == (0, ry0, width, ry1): return part
+                if strip is None: strip = Image.new(mode, (width, ry1-ry0))
+                strip.paste(part, (x0, r0-ry0))
+        return strip if strip is not None else Image.new(mode, (width, ry1-ry0))
+    return read
+
+class _keep_open:
+    # 업로드 파일 객체는 닫지 않고 그대로 사용 (with 문 모양만 맞춤)
+    def __init__(self, fp): self.fp = fp
+    def __enter__(self): return self.fp
+    def __exit__(self, *exc): return False
+
+class TiledSource:
+    # 전체를 한 Image로 두지 않는 대형 소스 — read(y0, y1)로 행 범위만 꺼냄 (render_tiled 전용)
+    # crop_focus·pad_fill에는 proxy()의 저해상도 이미지를 사용
+    def __init__(self, im: Image.Image, read):
+        self.size, self.mode, self.format = im.size, im.mode, im.format
+        self.info = {k: im.info[k] for k in META_KEYS if k in im.info}
+        self.read = read
+        self._proxy = None
+
+    width = property(lambda self: self.size[0])
+    height = property(lambda self: self.size[1])
+
+    def proxy(self, side: int = 2*FOCAL_PROXY_SIDE) -> Image.Image:
+        # 스트립마다 reduce해 모은 뒤 긴 변 side로 — 소스당 한 번만 계산
+        if self._proxy is None or max(self._proxy.size) < min(side, max(self.size)):
+            w, h = self.size; k = max(1, max(w, h)//(2*side)); step = strip_step(k)
+            small = Image.new(self.mode, (-(-w//k), -(-h//k)))
+            for y in range(0, h, step): small.paste(self.read(y, min(h, y+step)).reduce(k), (0, y//k))
+            small.thumbnail((side, side), Image.LANCZOS)
+            self._proxy = small
+        return self._proxy
+
+def pixel_limit(im: Image.Image) -> int:
+    # 이 소스에 허용하는 최대 픽셀 수 — 스트립으로 읽는 무압축 소스는 STREAM_MAX_MP, 그 외는 Pillow 한도
+    limit = Image.MAX_IMAGE_PIXELS or math.inf
+    if im.width*im.height > limit and raw_strip_reader(im) is not None: return max(limit, STREAM_MAX_MP*1e6)
+    return limit
+
+def open_image(fp):
+    # Image.open과 같지만, Pillow 한도의 2배를 넘어 DecompressionBombError가 나는 이미지도 무압축이라 스트립으로
+    # 읽을 수 있으면 헤더만 연 채로 반환 (플러그인 클래스를 직접 열어 한도 검사를 건너뜀). 픽셀 수는 pixel_limit로 확인
+    try:
+        return Image.open(fp)
+    except Image.DecompressionBombError as e:
+        err = e
+    for name in STREAM_FORMATS:
+        factory, accept = Image.OPEN[name]
+        if hasattr(fp, "seek"):
+            fp.seek(0); prefix = fp.read(16); fp.seek(0)
+        else:
+            with open(fp, "rb") as f: prefix = f.read(16)
+        if accept and not accept(prefix): continue
+        try:
+            im = factory(fp if hasattr(fp, "seek") else os.fspath(fp))
+        except (SyntaxError, OSError, ValueError):
+            continue
+        if im.width*im.height <= pixel_limit(im): return im
+        if not hasattr(fp, "seek"): im.close()  # 업로드 파일 객체는 닫지 않음
+    raise err
+
+def is_tiled(w: int, h: int) -> bool:
+    return bool(TILED_MIN_MP) and w*h >= TILED_MIN_MP*1e6
+
+def open_source(im: Image.Image, sizes=None):
+    # prepare_source의 대형 소스 버전 — TILED_MIN_MP 이상인 무압축 TIFF/BMP/PPM만 파일에서 스트립을 읽는 TiledSource
+    # 그 외(PNG·JPEG·압축 TIFF)는 부분 디코드가 안 되므로 크기와 상관없이 prepare_source (Pillow 픽셀 한도 적용)
+    read = raw_strip_reader(im) if is_tiled(*im.size) else None
+    if read is None: return prepare_source(im, sizes)
+    # 스트립마다 같은 (캐시된) ICC 변환을 적용
+    icc = im.info.get("icc_profile")
+    if not icc or icc_transform(icc, im.mode) is None: return TiledSource(im, read)
+    src = TiledSource(im, lambda y0, y1: to_srgb(read(y0, y1), icc))
+    src.info["icc_profile"] = srgb_profile()[1]
+    return src
+
+def strip_step(k: int) -> int:
+    # 한 번에 읽는 소스 행 수 — k와 무관하게 TILE_STRIP_ROWS 안팎, reduce(k)가 나눠떨어지도록 k의 배수로
+    return k*max(1, TILE_STRIP_ROWS//k)
+
+def tiled_plan(src_size, w: int, h: int, fit: str = "cover", focus=None):
+    # 타깃 → (소스 좌표 박스, 리샘플 크기, 출력 캔버스 위 위치)
+    if fit == "contain":
+        nw, nh = contain_size(src_size, w, h)
+        return (0, 0, *src_size), (nw, nh), ((w-nw)//2, (h-nh)//2)
+    nw, nh = cover_size(src_size, w, h)
+    return cover_box(src_size, nw, nh, w, h, focus), (w, h), (0, 0)
+
+def tiled_factor(plans) -> int:
+    # 모든 타깃이 공유하는 reduce 배수 — 가장 덜 줄어드는 타깃도 reduce 뒤에 PYRAMID_MIN_RATIO배 이상 남도록
+    if not PYRAMID_MIN_RATIO: return 1
+    ratio = min(min((b[2]-b[0])/ow, (b[3]-b[1])/oh) for b,(ow,oh),_ in plans)
+    return max(1, int(ratio/PYRAMID_MIN_RATIO))
+
+def tiled_cost(src_size, sizes, fit: str = "cover") -> int:
+    # render_tiled의 최대 메모리(바이트) 추정 — 같은 strip_step·tiled_factor 계산으로
+    # 읽은 스트립 ×3 (파일 바이트·디코드 결과·ICC/알파 변환 사본) + 창 ×2 (이어 붙일 때 이전 창과 새 창)
+    # + 출력 (contain은 여백 배경과 합성 결과까지 ×3)
+    # 창 높이(축소 행) = 스트립 하나 + 타깃이 한 번에 리샘플하는 행 + 위아래 LANCZOS 지지 범위
+    W, H = src_size
+    plans = [tiled_plan(src_size, w, h, fit) for w,h in sizes]
+    k = tiled_factor(plans); step = strip_step(k)
+    sy = max((b[3]-b[1])/k/oh for b,(_,oh),_ in plans)
+    rows = step//k + max(TILE_STRIP_ROWS, sy) + 2*(LANCZOS_SUPPORT*max(sy, 1) + 1)
+    return int(3*step*W*4 + 2*(-(-W//k))*rows*4) + sum(w*h for w,h in sizes)*4*(3 if fit == "contain" else 1)
+
+def render_tiled(src: TiledSource, sizes, fmt: str, quality: int, focus=None, fit: str = "cover", fill=(255,255,255),
+                 opts=None, budgets=None):
+    # 소스를 위에서부터 strip_step(k) 행씩 읽어 reduce(k) → 창(window)에 이어 붙이고, 타깃마다 LANCZOS 지지 범위가
+    # 창 안에 다 들어온 출력 행부터 box=로 리샘플해 붙여 넣음. 더 이상 필요 없는 창의 위쪽 행은 버림
+    # 메모리 = 출력 이미지 + 창(축소 폭 × 수백 행) / 결과는 reduce(k) 이미지 전체를 box=로 리샘플한 것과 같음
+    W, H = src.size
+    bg = flatten_color(fmt, fit, fill)  # 알파가 남지 않는 출력이면 스트립마다 읽자마자 합성
+    mode = "RGB" if bg is not None and src.mode in ("RGBA","LA") else src.mode
+    plans = [tiled_plan(src.size, w, h, fit, focus) for w,h in sizes]
+    k = tiled_factor(plans)
+    rw, rh = -(-W//k), -(-H//k)
+    outs = [Image.new(mode, size) for _,size,_ in plans]
+    state = []  # 타깃별 [박스(축소 좌표), 세로 배율, 스트립당 출력 행 수, 다음 출력 행]
+    for b,(ow,oh),_ in plans:
+        box = (b[0]*rw/W, b[1]*rh/H, min(rw, b[2]*rw/W), min(rh, b[3]*rh/H))
+        sy = (box[3]-box[1])/oh
+        state.append([box, sy, max(1, int(TILE_STRIP_ROWS/max(sy, 1))), 0])
+    def support(sy): return LANCZOS_SUPPORT*max(sy, 1) + 1
+    win, wy0 = None, 0
+    def advance(out, s, end, last):
+        box, sy, rows, oy = s; ow, oh = out.size
+        while oy < oh:
+            oy1 = min(oh, oy+rows)
+            ys0, ys1 = box[1] + oy*sy, min(box[3], box[1] + oy1*sy)
+            if not last and math.ceil(ys1 + support(sy)) > end: break
+            out.paste(win.resize((ow, oy1-oy), Image.LANCZOS, box=(box[0], ys0-wy0, box[2], ys1-wy0)), (0, oy))
+            oy = oy1
+        s[3] = oy
+    step = strip_step(k)
+    with ThreadPoolExecutor(max_workers=max(1, min(RENDER_WORKERS, len(sizes)))) as pool:
+        for y in range(0, H, step):
+            strip = src.read(y, min(H, y+step))
+            if bg is not None: strip = flatten_alpha(strip, bg)
+            if k > 1: strip = strip.reduce(k)
+            if win is not None:
+                joined = Image.new(mode, (rw, win.height+strip.height))
+                joined.paste(win, (0, 0)); joined.paste(strip, (0, win.height)); strip = joined
+            win = strip; end = wy0 + win.height
+            list(pool.map(lambda o, s: advance(o, s, end, end >= rh), outs, state))
+            # 남은 타깃이 다음에 필요로 하는 가장 위 행 앞까지 창을 잘라냄
+            keep = min((math.floor(s[0][1] + s[3]*s[1] - support(s[1])) for o,s in zip(outs, state) if s[3] < o.height),
+                       default=end)
+            keep = min(max(keep, wy0), end)
+            if keep > wy0: win = win.crop((0, keep-wy0, rw, win.height)); wy0 = keep
+        del win
+        def finish(i):
+            out, (_, _, pos) = outs[i], plans[i]
+            if fit == "contain":
+                w, h = sizes[i]
+                base = resize_cover(fill, w, h) if isinstance(fill, Image.Image) else Image.new("RGB", (w,h), fill)
+                out = ensure_rgb(out, base, pos)
+            return encode_budget(keep_meta(out, src), fmt, quality, (budgets or [None]*len(sizes))[i], opts)
+        yield from pool.map(finish, range(len(sizes)))
+
+
+# ---- 렌더 백엔드 ----
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+def process_pool() -> ProcessPoolExecutor:
+    # 프로세스 전체에서 하나만 — 여러 세션의 대형 작업이 같은 워커 수 안에서 나눠 씀
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            import multiprocessing
+            _process_pool = ProcessPoolExecutor(max_workers=RENDER_WORKERS,
+                                                mp_context=multiprocessing.get_context("spawn"))
+        return _process_pool
+
+def _reset_process_pool(pool: ProcessPoolExecutor):
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is pool: _process_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def _render_shared(shm_name: str, mode: str, size, w: int, h: int, fmt: str, quality: int, focus=None,
+                   fit: str = "cover", fill=(255,255,255), opts=None, max_bytes=None, meta=None):
+    # 워커: 공유 메모리의 픽셀을 복사 없이 Image로 감싸서 렌더 → (바이트, 품질, 인코딩 ms) / meta: 소스의 EXIF/ICC
+    from multiprocessing import shared_memory
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        raw = SHM_MODES[mode]
+        src = Image.frombuffer(raw, size, shm.buf, "raw", raw, 0, 1)
+        src.info.update(meta or {})
+        out = resize_fit(src, w, h, focus=focus, fit=fit, fill=fill)
+        del src
+        # RGBX로 감싼 RGB 소스의 cover 결과만 되돌림 — contain 결과(RGB)는 그대로
+        return encode_budget(out.convert(mode) if out.mode == SHM_MODES[mode] != mode else out, fmt, quality,
+                             max_bytes, opts)
+    finally:
+        shm.close()
+
+def render_shared(src: Image.Image, sizes, fmt: str, quality: int, focus=None, fit: str = "cover", fill=(255,255,255),
+                  opts=None, budgets=None):
+    # 디코드된 픽셀을 shared_memory에 한 번만 올리고, 워커는 이름만 받아 붙습니다(타깃별 pickle 없음)
+    # 블러 여백(fill)과 메타데이터(metadata="keep"일 때만)는 작으므로 그대로 pickle로 전달
+    from multiprocessing import shared_memory
+    meta = {k: src.info[k] for k in META_KEYS if k in src.info} if (opts or {}).get("metadata") == "keep" else None
+    raw = SHM_MODES[src.mode]
+    shm = shared_memory.SharedMemory(create=True, size=src.width*src.height*len(raw))
+    try:
+        # 공유 메모리를 복사 없이 감싼 Image에 바로 paste — tobytes() 같은 전체 크기 중간 사본 없이
+        # (frombuffer 결과는 readonly라 그대로 paste하면 사본을 만들므로 해제) / RGB 소스는 view가 RGBX라
+        # paste가 모드 변환 사본을 만들므로 TILE_STRIP_ROWS 행씩 나눠 그 임시 사본을 띠 하나 크기로 제한
+        view = Image.frombuffer(raw, src.size, shm.buf, "raw", raw, 0, 1)
+        view.readonly = 0
+        for y in range(0, src.height, TILE_STRIP_ROWS):
+            view.paste(src.crop((0, y, src.width, min(src.height, y+TILE_STRIP_ROWS))), (0, y))
+        del view
+        pool = process_pool()
+        futures = [pool.submit(_render_shared, shm.name, src.mode, src.size, w, h, fmt, quality, focus, fit, fill,
+                               opts, b, meta) for (w,h),b in zip(sizes, budgets or [None]*len(sizes))]
+        try:
+            for f in futures: yield f.result()
+        except BrokenProcessPool:
+            _reset_process_pool(pool); raise
+        finally:
+            for f in futures: f.cancel()
+    finally:
+        shm.close(); shm.unlink()
+
+def render_threaded(src: Image.Image, sizes, fmt: str, quality: int, focus=None, fit: str = "cover",
+                    fill=(255,255,255), opts=None, budgets=None):
+    levels = build_pyramid(src, sizes)
+    with ThreadPoolExecutor(max_workers=max(1, min(RENDER_WORKERS, len(sizes)))) as pool:
+        # map()은 입력 순서대로 결과를 돌려주므로 ZIP 항목 순서는 기존과 동일
+        yield from pool.map(lambda s, b: render_target(src, levels, s[0], s[1], fmt, quality, focus, fit, fill, opts, b),
+                            sizes, budgets or [None]*len(sizes))
+
+def use_process_pool(src: Image.Image) -> bool:
+    return bool(PROCESS_POOL_MIN_MP) and src.mode in SHM_MODES and src.width*src.height >= PROCESS_POOL_MIN_MP*1e6
+
+def render_all(src: Image.Image, sizes, fmt: str, quality: int, focus=None, fit: str = "cover", fill=(255,255,255),
+               opts=None, budgets=None):
+    # 소스 크기에 따라 백엔드 선택 — (인코딩된 바이트, 품질, 인코딩 ms)를 sizes 순서대로 내보냄
+    # budgets: sizes와 같은 순서의 용량 상한(바이트 또는 None) — 있으면 그 안에 들어가는 품질로 인코딩
+    if isinstance(src, TiledSource):
+        return render_tiled(src, sizes, fmt, quality, focus, fit, fill, opts, budgets)
+    if use_process_pool(src):
+        return render_shared(src, sizes, fmt, quality, focus, fit, fill, opts, budgets)
+    return render_threaded(src, sizes, fmt, quality, focus, fit, fill, opts, budgets)
+
+def zip_compression(fmt: str, level=None):
+    # (compression, compresslevel) — level None: 포맷별 자동, 0: 무압축, 1~9: deflate 레벨 지정
+    if level is None:
+        return (zipfile.ZIP_STORED, None) if fmt in ENTROPY_CODED_FORMATS else (zipfile.ZIP_DEFLATED, None)
+    return (zipfile.ZIP_STORED, None) if level == 0 else (zipfile.ZIP_DEFLATED, int(level))
+
+# ---- 렌더 캐시 ----
+def source_hash(data) -> str:
+    # 업로드 원본 바이트의 콘텐츠 해시 (bytes/memoryview)
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def render_key(src_hash: str, w: int, h: int, fmt: str, quality: int, scale: float, resample: str = "lanczos",
+               crop: str = "center", focus=None, fit: str = "cover", pad: str = "#ffffff", opts=None, max_bytes=None):
+    # 파일명(타이틀/라벨)은 키에 넣지 않음 — 이름만 바뀌면 캐시된 결과를 그대로 사용
+    # focus는 사용자가 직접 지정한 초점일 때만 (자동 방식은 crop 이름으로 충분)
+    # contain은 크롭이 없으므로 crop/focus 대신 여백(pad)만 구분 / 무손실 PNG는 quality 무관
+    fmt = "jpeg" if fmt in ("jpg","jpeg") else fmt
+    focus = (round(focus[0], 4), round(focus[1], 4)) if focus else None
+    crop, focus, pad = (None, None, pad.lower()) if fit == "contain" else (crop, focus, None)
+    return (src_hash, w, h, fmt, None if fmt == "png" else int(quality), resample, float(scale), crop, focus, fit, pad,
+            tuple(sorted((opts or {}).items())), max_bytes if fmt in BUDGET_FORMATS else None)
+
+class RenderCache:
+    # 인코딩된 출력 (바이트, 품질, 인코딩 ms)의 LRU 캐시 — 총 바이트 상한, 스레드 안전 (Streamlit 세션 간 공유)
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None: self._items.move_to_end(key)
+            return data
+
+    def put(self, key, out):
+        data = out[0]
+        if len(data) > self.max_bytes: return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None: self._bytes -= len(old[0])
+            self._items[key] = out; self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False); self._bytes -= len(evicted[0])
+
+# ---- 내보내기 허용 제어 ----
+def header_cost(im: Image.Image, sizes) -> int:
+    # 헤더(크기·포맷·타일)만 보고 이 소스를 sizes로 렌더할 때의 최대 메모리(바이트)를 추정 — 디코드하지 않음
+    # 디코드 픽셀은 RGB도 내부적으로 4바이트 / prepare_source는 EXIF 회전·모드 변환 사본을 잠시 하나 더 만들고,
+    # 그 뒤 피라미드 ≈ 1/3 또는 프로세스 풀의 공유 메모리 사본 1개 (띠 단위로 복사하므로 변환 임시 사본은 띠 하나)
+    # 스트립 처리 소스는 렌더 방식(cover/contain)을 모르므로 둘 중 큰 쪽
+    if not sizes: return 0
+    w, h = im.size
+    if im.format == "JPEG":
+        # prepare_source의 draft와 같은 기준으로 DCT 축소(1/2·1/4·1/8) 후 크기를 어림
+        # (EXIF 회전 여부를 모르므로 짧은 변 기준으로 보수적으로)
+        s = max(max(tw, th)/min(w, h) for tw,th in sizes)
+        r = 1
+        while r < 8 and 2*r*s <= 1: r *= 2
+        w, h = -(-w//r), -(-h//r)
+    outs = sum(tw*th for tw,th in sizes)*4
+    if is_tiled(w, h) and raw_strip_reader(im) is not None: return max(tiled_cost((w, h), sizes, f) for f in FIT_MODES)
+    pool = PROCESS_POOL_MIN_MP and w*h >= PROCESS_POOL_MIN_MP*1e6
+    return w*h*4 + max(w*h*4, (w*h*4 + TILE_STRIP_ROWS*w*4 if pool else w*h*4//3) + outs)
+
+class AdmissionGate:
+    # 무거운 내보내기의 프로세스 전체 허용 제어 — 실행 중 작업 수(slots)와 예상 메모리 합(budget)을 넘지 않게
+    # 도착 순서(FIFO)대로 들여보냄. 혼자서 budget을 넘는 작업도 앞 작업이 모두 끝나면 단독으로 실행
+    def __init__(self, slots: int = EXPORT_SLOTS, budget: int = int(EXPORT_BUDGET_MB*2**20)):
+        self.slots, self.budget = max(1, slots), budget
+        self._queue = deque()
+        self._running = 0
+        self._used = 0
+        self._cond = threading.Condition()
+
+    def _ready(self, ticket) -> bool:
+        return self._queue[0] is ticket and self._running < self.slots and \
+            (self._running == 0 or self._used + ticket[0] <= self.budget)
+
+    @contextmanager
+    def admit(self, cost: int, on_wait=None, poll: float = 0.5):
+        # 차례가 올 때까지 대기 — on_wait(대기 순번, 1부터)를 poll초마다 잠금 밖에서 호출
+        # (Streamlit은 이 호출에서 세션 중단을 처리하므로, 중단되면 대기열에서 빠짐)
+        ticket = [cost]
+        with self._cond: self._queue.append(ticket)
+        try:
+            while True:
+                with self._cond:
+                    if self._ready(ticket):
+                        self._queue.popleft(); self._running += 1; self._used += cost
+                        self._cond.notify_all(); break
+                    pos = self._queue.index(ticket) + 1
+                if on_wait: on_wait(pos)
+                with self._cond:
+                    if not self._ready(ticket): self._cond.wait(poll)
+        except BaseException:
+            with self._cond:
+                self._queue.remove(ticket); self._cond.notify_all()
+            raise
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._running -= 1; self._used -= cost; self._cond.notify_all()
+
+    def status(self):
+        # (실행 중, 대기 중) 작업 수
+        with self._cond: return self._running, len(self._queue)
+
+# ---- 사용자 초점 ----
+class FocalStore:
+    # 콘텐츠 해시 → 사용자가 지정한 초점 (fx, fy). JSON 파일 하나를 다른 프로세스와 공유하므로
+    # 읽을 때마다 mtime을 확인해 바뀌었으면 다시 읽고, 쓸 때는 임시 파일로 교체
+    def __init__(self, path=FOCAL_STORE_PATH):
+        self.path = str(path)
+        self._points = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            self._points, self._mtime = {}, None; return
+        if mtime != self._mtime:
+            try:
+                with open(self.path, encoding="utf-8") as f: self._points = json.load(f)
+            except (OSError, ValueError):
+                self._points = {}
+            self._mtime = mtime
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f: json.dump(self._points, f)
+        os.replace(tmp, self.path)
+        self._mtime = os.stat(self.path).st_mtime_ns
+
+    def get(self, key: str):
+        with self._lock:
+            self._refresh()
+            p = self._points.get(key)
+            return (p[0], p[1]) if p else None
+
+    def set(self, key: str, focus):
+        with self._lock:
+            self._refresh()
+            self._points[key] = [round(float(focus[0]), 4), round(float(focus[1]), 4)]
+            self._save()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._refresh()
+            if self._points.pop(key, None) is not None: self._save()
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return len(self._points)
+
+def _write_entries(zf, names, sizes, fmt: str, quality: int, hits, src, focus=None, cache=None, keys=None,
+                   fit: str = "cover", fill=(255,255,255), opts=None, budgets=None, report=None) -> int:
+    # 항목은 zf.open(name, "w")로 스트리밍 — 캐시·용량 상한 없이 단일 워커면 인코더가 ZIP 항목에 직접 씀,
+    # 병렬일 때는 타깃별 바이트를 쓰자마자 버려서 동시에 메모리에 남는 결과를 최소화
+    # report(list)를 주면 항목마다 (name, 품질, 바이트, 인코딩 ms — 캐시에서 가져오면 None)를 추가
+    budgets = budgets or [None]*len(sizes)
+    if cache is None and RENDER_WORKERS == 1 and not any(budgets) and not use_process_pool(src) \
+            and not isinstance(src, TiledSource):
+        levels = build_pyramid(src, sizes)
+        for name,(w,h) in zip(names, sizes):
+            out = resize_fit(src, w, h, levels, focus, fit, fill)
+            t0 = time.perf_counter()
+            with zf.open(name, "w") as fp: encode_image(out, fmt, quality, fp, opts)
+            if report is not None:
+                report.append((name, quality, zf.getinfo(name).file_size, (time.perf_counter()-t0)*1000))
+        return len(sizes)
+    missing = [i for i,out in enumerate(hits) if out is None]
+    rendered = iter(render_all(src, [sizes[i] for i in missing], fmt, quality, focus, fit, fill, opts,
+                               [budgets[i] for i in missing])) if missing else iter(())
+    for i,(name,out) in enumerate(zip(names, hits)):
+        ms = None
+        if out is None:
+            out = next(rendered); ms = out[2]
+            if cache is not None: cache.put(keys[i], out)
+        with zf.open(name, "w") as fp: fp.write(out[0])
+        if report is not None: report.append((name, out[1], len(out[0]), ms))
+    return len(missing)
+
+def write_zip_batch(zf, jobs, sizes, fmt: str, quality: int, cache=None, prefetch: int = 1, crop: str = "center",
+                    fit: str = "cover", pad: str = "#ffffff", opts=None, budgets=None, report=None, errors=None) -> int:
+    # jobs: [(names, load_source, keys, focus)] — 소스별 항목을 jobs 순서대로 기록
+    # budgets: sizes와 같은 순서의 용량 상한 / report: 항목별 (name, 품질, 바이트, 인코딩 ms)를 받을 list
+    # errors(list)를 주면 디코드·렌더에 실패한 소스는 (jobs 인덱스, 예외)를 추가하고 건너뜀 (없으면 그대로 raise)
+    # load_source(sizes) → open_source 결과(이미지 또는 TiledSource). 캐시에 없는 사이즈가 있을 때만, 그 사이즈들로 호출
+    # focus가 None이면 crop 방식으로, contain이면 여백(pad_fill)을 소스마다 한 번 계산 (디코드와 함께 로더 스레드에서)
+    # 출력에 알파가 남지 않으면(JPEG·단색 여백) 알파 합성도 이때 소스당 한 번 (flatten_alpha)
+    # 다음 prefetch개 소스의 디코드를 현재 소스의 렌더와 겹쳐 실행 (메모리에는 최대 prefetch+1개 소스)
+    # 반환값: 새로 렌더한 사이즈 수
+    def load(job):
+        _, load_source, keys, focus = job
+        hits = [cache.get(k) for k in keys] if cache is not None else [None]*len(sizes)
+        missing = [sz for sz,out in zip(sizes, hits) if out is None]
+        src = load_source(missing) if missing else None
+        fill = None; view = src.proxy() if isinstance(src, TiledSource) else src
+        if src is not None and fit == "contain": fill = pad_fill(view, pad)
+        elif src is not None and focus is None: focus = crop_focus(view, crop)
+        bg = flatten_color(fmt, fit, fill)
+        if bg is not None and isinstance(src, Image.Image): src = flatten_alpha(src, bg)
+        return hits, src, focus, fill
+    rendered = 0
+    with ThreadPoolExecutor(max_workers=max(1, prefetch)) as loader:
+        ahead = deque(loader.submit(load, job) for job in jobs[:prefetch+1])
+        for i,(names,_,keys,_) in enumerate(jobs):
+            try:
+                hits, src, focus, fill = ahead.popleft().result()
+                rendered += _write_entries(zf, names, sizes, fmt, quality, hits, src, focus, cache, keys, fit, fill,
+                                           opts, budgets, report)
+            except Exception as e:
+                if errors is None: raise
+                errors.append((i, e))
+            hits = src = None
+            if i+prefetch+1 < len(jobs): ahead.append(loader.submit(load, jobs[i+prefetch+1]))
+    return rendered
+
+
+# ---- CLI ----
+def list_sources(path):
+    p = Path(path)
+    if p.is_file(): return [p]
+    return sorted(f for f in p.iterdir() if f.is_file() and f.suffix.lower() in VALID_EXTS)
+
+def source_folders(paths, taken=()):
+    # 소스별 출력 폴더 — 파일명 stem 기준, 겹치면(banner.jpg + banner.png) 앱 배치 모드처럼 "_"를 붙여 구분
+    # taken: 이미 다른 소스가 쓰고 있는 폴더
+    used = set(taken); folders = {}
+    for p in paths:
+        folder = sanitize_label(Path(p).stem)
+        while folder in used: folder += "_"
+        used.add(folder); folders[p] = folder
+    return folders
+
+def file_loader(path, pixels=None):
+    # write_zip_batch용 load_source — 파일을 열어 need 기준으로 디코드 (대형 소스는 TiledSource)
+    # pixels(dict)를 주면 디코드한 소스의 헤더 기준 픽셀 수를 path별로 기록 (처리량 요약용)
+    def load_source(need):
+        with open_image(path) as im:
+            src = open_source(im, need)
+            if pixels is not None: pixels[path] = im.width*im.height
+            return src
+    return load_source
+
+def render_file(path, out_dir, targets, fmt: str = "jpg", quality: int = 88, scale: float = 2.0, crop: str = "center",
+                focus=None, fit: str = "cover", pad: str = "#ffffff", opts=None):
+    # 파일 하나를 모든 targets로 렌더해 out_dir에 바로 저장 (CLI 프로세스 워커에서 실행)
+    # → ([(저장 경로, 품질, 바이트)], 헤더 기준 원본 픽셀 수)
+    # focus(사용자 지정 초점)가 있으면 crop 방식 대신 사용 / 용량 상한이 있는 타깃은 메모리에서 품질을 맞춘 뒤 저장
+    sizes = [scaled_size(tw, th, scale) for _,tw,th,_ in targets]
+    pixels = {}
+    src = file_loader(path, pixels)(sizes)  # 열었던 원본(디코드된 코어)은 로더 안에서 놓아줌
+    tiled = isinstance(src, TiledSource); view = src.proxy() if tiled else src
+    if fit == "contain": fill = pad_fill(view, pad)
+    else: focus, fill = focus or crop_focus(view, crop), None
+    bg = flatten_color(fmt, fit, fill)
+    if bg is not None and not tiled: src = flatten_alpha(src, bg)
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    if tiled:
+        # 대형 소스는 모든 타깃을 스트립 한 번 훑어서 렌더한 뒤 바이트를 저장
+        for (label,_,_,_),(w,h),(data,q,_) in zip(targets, sizes, render_tiled(src, sizes, fmt, quality, focus, fit, fill,
+                                                                                opts, [t[3] for t in targets])):
+            dest = os.path.join(out_dir, output_name(Path(path).stem, label, w, h, fmt))
+            with open(dest, "wb") as fp: fp.write(data)
+            written.append((dest, q, len(data)))
+        return written, pixels[path]
+    levels = build_pyramid(src, sizes)
+    for (label,_,_,max_bytes),(w,h) in zip(targets, sizes):
+        dest = os.path.join(out_dir, output_name(Path(path).stem, label, w, h, fmt))
+        out = resize_fit(src, w, h, levels, focus, fit, fill)
+        if max_bytes and fmt in BUDGET_FORMATS:
+            data, q, _ = encode_budget(out, fmt, quality, max_bytes, opts)
+            with open(dest, "wb") as fp: fp.write(data)
+        else:
+            with open(dest, "wb") as fp: encode_image(out, fmt, quality, fp, opts)
+            q = quality
+        written.append((dest, q, os.path.getsize(dest)))
+    return written, pixels[path]
+
+# ---- 폴더 감시 ----
+MANIFEST_NAME = ".resizer_manifest.json"
+
+def file_hash(path) -> str:
+    # source_hash와 같은 다이제스트를 파일에서 스트리밍으로 계산
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""): h.update(chunk)
+    return h.hexdigest()
+
+def settings_key(targets, fmt: str, quality: int, scale: float, crop: str = "center", fit: str = "cover",
+                 pad: str = "#ffffff", opts=None) -> str:
+    # 출력 설정이 바뀌면 매니페스트의 기존 기록을 무효화
+    blob = json.dumps([[list(t) for t in targets], fmt, int(quality), float(scale), crop, fit, pad, opts or {}], sort_keys=True)
+    return hashlib.blake2b(blob.encode(), digest_size=8).hexdigest()
+
+def load_manifest(out_dir) -> dict:
+    try:
+        with open(os.path.join(out_dir, MANIFEST_NAME), encoding="utf-8") as f: return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(out_dir, manifest: dict):
+    # 임시 파일에 쓰고 교체 — 도중에 종료돼도 매니페스트가 깨지지 않음
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, MANIFEST_NAME); tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f: json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+def pending_sources(src_dir, files: dict, settings: str, store=None, settle: float = 2.0):
+    # 새로 생겼거나 바뀐 소스 → ([(path, stat, hash)], 매니페스트 갱신 여부)
+    # mtime·크기가 그대로면 건너뛰고, 바뀌었어도 콘텐츠 해시가 같으면(복사/터치만 된 경우) 기록만 갱신
+    # 사용자 초점(store)이 기록과 달라진 소스도 다시 렌더 / 렌더에 실패한 소스도 기록되므로 파일이 바뀔 때만 다시 시도
+    todo = []; touched = False; now = time.time()
+    def same_focus(e): return store is None or store.get(e["hash"]) == (tuple(e["focus"]) if e.get("focus") else None)
+    for p in list_sources(src_dir):
+        try:
+            st = p.stat()
+            if now - st.st_mtime < settle: continue  # 아직 복사 중일 수 있음 — 다음 주기에 확인
+            e = files.get(p.name)
+            if e and e["settings"] == settings and e["mtime_ns"] == st.st_mtime_ns and e["size"] == st.st_size \
+                    and same_focus(e): continue
+            digest = file_hash(p)
+        except OSError:
+            continue  # 목록을 읽은 뒤 이름이 바뀌었거나 지워진 파일 — 공유 폴더에서는 흔함, 다음 주기에 다시 확인
+        if e and e["settings"] == settings and e["hash"] == digest and same_focus(e):
+            e["mtime_ns"], e["size"] = st.st_mtime_ns, st.st_size; touched = True
+            continue
+        todo.append((p, st, digest))
+    return todo, touched
+
+def watch_folder(src_dir, out_dir, targets, fmt: str, quality: int, scale: float, crop: str = "center",
+                 workers: int = RENDER_WORKERS, interval: float = 5.0, once: bool = False, store=None,
+                 fit: str = "cover", pad: str = "#ffffff", opts=None, log=print) -> int:
+    # src_dir를 주기적으로 확인해 새/변경 이미지만 렌더, out_dir/.resizer_manifest.json에 기록 (재시작해도 이어서)
+    import multiprocessing
+    settings = settings_key(targets, fmt, quality, scale, crop, fit, pad, opts)
+    if fit == "contain": store = None  # 크롭이 없으니 초점 변경은 재렌더 대상이 아님
+    manifest = load_manifest(out_dir)
+    files = manifest.setdefault("files", {})
+    failed = 0
+    with ProcessPoolExecutor(max_workers=max(1, workers), mp_context=multiprocessing.get_context("spawn")) as pool:
+        while True:
+            todo, touched = pending_sources(src_dir, files, settings, store)
+            futures = {}
+            # 출력 폴더는 매니페스트에 기록된 것을 계속 사용 — 새 소스만 다른 소스와 겹치지 않게 배정
+            taken = {e.get("folder") or sanitize_label(Path(n).stem) for n,e in files.items()
+                     if n not in {p.name for p,_,_ in todo}}
+            for p, st, digest in todo:
+                focus = store.get(digest) if store is not None else None
+                folder = (files.get(p.name) or {}).get("folder") or source_folders([p], taken)[p]
+                taken.add(folder)
+                futures[pool.submit(render_file, str(p), os.path.join(out_dir, folder),
+                                    targets, fmt, quality, scale, crop, focus, fit, pad,
+                                    opts)] = (p, st, digest, focus, folder)
+            for f in as_completed(futures):
+                p, st, digest, focus, folder = futures[f]
+                try:
+                    written, _ = f.result(); error = None
+                except Exception as e:
+                    written, error = [], str(e)
+                # 실패도 mtime·크기·해시와 함께 기록 — 같은 파일을 주기마다 다시 렌더하지 않음
+                files[p.name] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "hash": digest, "settings": settings,
+                                 "focus": list(focus) if focus else None, "folder": folder,
+                                 "outputs": [os.path.relpath(w, out_dir) for w,_,_ in written]}
+                if error is not None: files[p.name]["error"] = error
+                save_manifest(out_dir, manifest); touched = False
+                if error is not None:
+                    failed += 1; log(f"✗ {p.name}: {error}"); continue
+                log(f"✓ {p.name} ({len(written)}개)")
+                for (dest, q, n),t in zip(written, targets): print_budget(os.path.basename(dest), q, n, t[3], log)
+            if touched: save_manifest(out_dir, manifest)
+            if once: return 1 if failed else 0
+            time.sleep(interval)
+
+def print_budget(name: str, quality: int, nbytes: int, max_bytes, log=print):
+    # 용량 상한이 있는 파일만 선택된 품질과 최종 크기를 출력
+    if not max_bytes: return
+    mark = "" if nbytes <= max_bytes else " ⚠ 최저 품질로도 초과"
+    log(f"  {name}: 품질 {quality} · {format_bytes(nbytes)} / 상한 {format_bytes(max_bytes)}{mark}")
+
+def main(argv=None) -> int:
+    import argparse
+    ap = argparse.ArgumentParser(prog="resizer", description="이미지 폴더를 프리셋/커스텀 사이즈로 일괄 추출합니다.")
+    ap.add_argument("input", help="원본 이미지 폴더 (또는 파일 하나)")
+    ap.add_argument("-o", "--output", required=True, help="출력 폴더 (--zip이면 ZIP 파일 경로)")
+    ap.add_argument("--format", choices=OUTPUT_FORMATS, default="jpg")
+    ap.add_argument("--quality", type=int, default=88, help="JPG/WebP/AVIF 품질 (기본 88)")
+    ap.add_argument("--effort", type=int, default=None, help="WebP(0~6)/AVIF(0~10) 인코딩 노력 — 클수록 느리고 작음")
+    ap.add_argument("--progressive", action="store_true", help="프로그레시브 JPEG로 저장")
+    ap.add_argument("--subsampling", choices=JPEG_SUBSAMPLING, default=None, help="JPEG 크로마 서브샘플링 (기본: 4:2:0)")
+    ap.add_argument("--png-level", choices=list(PNG_LEVELS), default="balanced",
+                    help="PNG 압축: fast(빠름) / balanced(기본) / max(최소 용량, 느림)")
+    ap.add_argument("--png-colors", type=int, default=None, help="PNG를 N색(2~256) 팔레트로 줄임 — 평면 그래픽용")
+    ap.add_argument("--keep-metadata", action="store_true", help="원본 EXIF/ICC를 출력에 유지 (기본: 제거)")
+    ap.add_argument("--scale", type=float, default=2.0, help="출력 배율 (기본 2.0)")
+    ap.add_argument("--preset", action="append", metavar="NAME", help="사용할 프리셋 이름 (반복 가능, 기본: 전체)")
+    ap.add_argument("--no-presets", action="store_true", help="프리셋 없이 --size만 사용")
+    ap.add_argument("--size", action="append", default=[], metavar="'라벨, WxH[, 150KB]'",
+                    help="커스텀 사이즈, 세 번째 값은 용량 상한 (반복 가능)")
+    ap.add_argument("--max-bytes", action="append", default=[], metavar="[NAME=]150KB",
+                    help="용량 상한 — NAME 없이 쓰면 모든 사이즈, NAME=은 해당 프리셋/라벨만 (JPG/WebP/AVIF, 반복 가능)")
+    ap.add_argument("--crop", choices=list(CROP_STRATEGIES), default="center", help="크롭 방식 (smart: 관심 영역 자동 탐지)")
+    ap.add_argument("--fit", choices=FIT_MODES, default="cover", help="cover: 채우고 크롭 / contain: 전체가 보이게 맞추고 여백 채움")
+    ap.add_argument("--pad", default="#ffffff", help="contain 여백: 색(#ffffff, white 등) 또는 blur (원본을 흐리게 깔기)")
+    ap.add_argument("--focal-store", default=FOCAL_STORE_PATH, help="사용자 지정 초점 파일 (앱에서 지정한 초점을 재사용)")
+    ap.add_argument("--workers", type=int, default=RENDER_WORKERS, help="동시에 처리할 이미지 수 (기본: CPU 수)")
+    ap.add_argument("--zip", action="store_true", help="폴더 대신 ZIP 하나로 저장 (이미지별 폴더)")
+    ap.add_argument("--watch", action="store_true", help="입력 폴더를 감시하며 새로 들어오거나 바뀐 이미지만 추출")
+    ap.add_argument("--interval", type=float, default=5.0, help="--watch 확인 주기(초, 기본 5)")
+    ap.add_argument("--once", action="store_true", help="--watch와 같이 쓰면 한 번만 동기화하고 종료 (크론용)")
+    args = ap.parse_args(argv)
+    if args.watch and args.zip: ap.error("--watch와 --zip은 함께 쓸 수 없습니다.")
+
+    names = {n for n,_ in PRESETS}
+    unknown = set(args.preset or []) - names
+    if unknown:
+        ap.error(f"알 수 없는 프리셋: {', '.join(sorted(unknown))} (사용 가능: {', '.join(n for n,_ in PRESETS)})")
+    targets = [] if args.no_presets else [(n,w,h,None) for n,(w,h) in PRESETS if not args.preset or n in args.preset]
+    custom, ignored = parse_custom_sizes("\n".join(args.size))
+    for line in ignored: print(f"무시된 입력: {line}", file=sys.stderr)
+    targets += custom
+    if not targets: ap.error("내보낼 사이즈가 없습니다.")
+    budgets = {}
+    for spec in args.max_bytes:
+        name, _, value = spec.rpartition("=")
+        try: budgets[name or None] = parse_bytes(value)
+        except ValueError: ap.error(f"용량 상한을 읽을 수 없습니다: {spec}")
+    if budgets:
+        if args.format not in BUDGET_FORMATS: ap.error("--max-bytes는 jpg/jpeg/webp/avif 포맷에서만 사용합니다.")
+        targets = [(n,w,h, b or budgets.get(n, budgets.get(None))) for n,w,h,b in targets]
+    if args.pad != "blur":
+        try: ImageColor.getrgb(args.pad)
+        except ValueError: ap.error(f"알 수 없는 여백 색: {args.pad}")
+    opts = {}
+    if args.effort is not None:
+        if args.format not in EFFORT_RANGES: ap.error("--effort는 webp/avif 포맷에서만 사용합니다.")
+        lo, hi, _ = EFFORT_RANGES[args.format]
+        if not lo <= args.effort <= hi: ap.error(f"{args.format} effort 범위: {lo}~{hi}")
+        opts["effort"] = args.effort
+    if (args.progressive or args.subsampling) and args.format not in ("jpg","jpeg"):
+        ap.error("--progressive/--subsampling은 jpg/jpeg 포맷에서만 사용합니다.")
+    if args.progressive: opts["progressive"] = True
+    if args.subsampling: opts["subsampling"] = args.subsampling
+    if args.keep_metadata: opts["metadata"] = "keep"
+    if (args.png_level != "balanced" or args.png_colors) and args.format != "png":
+        ap.error("--png-level/--png-colors는 png 포맷에서만 사용합니다.")
+    if args.png_colors is not None and not 2 <= args.png_colors <= 256: ap.error("--png-colors 범위: 2~256")
+    if args.png_level != "balanced": opts["png"] = args.png_level
+    if args.png_colors: opts["quantize"] = args.png_colors
+    store = FocalStore(args.focal_store)
+    if args.watch:
+        try:
+            return watch_folder(args.input, args.output, targets, args.format, args.quality, args.scale,
+                                args.crop, args.workers, args.interval, args.once, store, args.fit, args.pad,
+                                opts)
+        except KeyboardInterrupt:
+            return 0
+    sources = list_sources(args.input)
+    if not sources: ap.error(f"이미지가 없습니다: {args.input}")
+    # 저장된 초점이 있을 때만 소스 해시를 계산
+    focuses = {p: store.get(file_hash(p)) for p in sources} if args.fit == "cover" and len(store) else {}
+
+    folders = source_folders(sources)
+    t0 = time.perf_counter(); failed = 0
+    pixels = {}  # 성공한 소스의 헤더 기준 원본 픽셀 (처리량 요약용 — 원본을 다시 열지 않음)
+    if args.zip:
+        sizes = [scaled_size(tw, th, args.scale) for _,tw,th,_ in targets]
+        jobs = [([f"{folders[p]}/{output_name(p.stem, label, w, h, args.format)}"
+                  for (label,_,_,_),(w,h) in zip(targets, sizes)], file_loader(p, pixels), None, focuses.get(p))
+                for p in sources]
+        compression, compresslevel = zip_compression(args.format)
+        report = []; errors = []
+        with zipfile.ZipFile(args.output, "w", compression=compression, compresslevel=compresslevel) as zf:
+            # 깨진 파일 하나로 배치 전체가 멈추지 않도록 소스별로 실패를 모음
+            write_zip_batch(zf, jobs, sizes, args.format, args.quality, crop=args.crop, fit=args.fit, pad=args.pad,
+                            opts=opts, budgets=[t[3] for t in targets], report=report, errors=errors)
+        for i, e in errors:
+            failed += 1; pixels.pop(sources[i], None); print(f"✗ {sources[i].name}: {e}", file=sys.stderr)
+        budgets = {name: t[3] for job in jobs for name,t in zip(job[0], targets)}
+        for name, q, n, _ in report: print_budget(name, q, n, budgets[name])
+    else:
+        import multiprocessing
+        with ProcessPoolExecutor(max_workers=max(1, args.workers), mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {pool.submit(render_file, str(p), os.path.join(args.output, folders[p]),
+                                   targets, args.format, args.quality, args.scale, args.crop, focuses.get(p),
+                                   args.fit, args.pad, opts): p
+                       for p in sources}
+            for f in as_completed(futures):
+                try:
+                    written, pixels[futures[f]] = f.result()
+                    print(f"✓ {futures[f].name} ({len(written)}개)")
+                    for (dest, q, n),t in zip(written, targets): print_budget(os.path.basename(dest), q, n, t[3])
+                except Exception as e:
+                    failed += 1; print(f"✗ {futures[f].name}: {e}", file=sys.stderr)
+    elapsed = max(time.perf_counter()-t0, 1e-6)
+    mp = sum(pixels.values())/1e6
+    print(f"완료: 이미지 {len(sources)-failed}/{len(sources)}개 · {len(sources)/elapsed:.2f} images/s · {mp/elapsed:.1f} MP/s ({elapsed:.1f}s)")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())